@@ -0,0 +1,128 @@
+# Disk backed cache for BEA API responses
+# Every Streamlit worker (and every replica sharing the cache folder) reads the same json files, so a cold start only
+# goes to the BEA API when the cached response is missing or older than the TTL.
+#
+# The cache is configured through environment variables (they can also be put in the .env file next to BEA_API_KEY):
+#   BEA_API_URL        - base url of the BEA API, point it at a local server replaying recorded responses for testing
+#   BEA_CACHE_DIR      - folder where the responses are stored (default .bea_cache)
+#   BEA_CACHE_TTL      - seconds a cached response stays fresh (default 86400, one day)
+#   BEA_CACHE_MAX_MB   - size bound of the cache folder, least recently used responses are evicted first (default 100)
+#   BEA_OFFLINE        - set to 1 to only serve responses from the cache and never call the BEA API
+#
+# A folder of recorded responses can be replayed as is with BEA_CACHE_DIR=<folder> and BEA_OFFLINE=1
+
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+import requests
+
+
+BEA_API_URL = "http://apps.bea.gov/api/data"
+
+# query parameters which do not change the response and are left out of the cache key
+IGNORED_PARAMS = {"userid", "resultformat"}
+
+
+def get_cache_settings():
+    # read the settings on every call so a changed .env or environment is picked up without a restart
+    return {
+        "api_url": os.getenv("BEA_API_URL", BEA_API_URL),
+        "cache_dir": Path(os.getenv("BEA_CACHE_DIR", ".bea_cache")),
+        "ttl": float(os.getenv("BEA_CACHE_TTL", 24 * 60 * 60)),
+        "max_bytes": float(os.getenv("BEA_CACHE_MAX_MB", 100)) * 1024 * 1024,
+        "offline": os.getenv("BEA_OFFLINE", "").lower() in ("1", "true", "yes"),
+    }
+
+
+def get_cache_key(params):
+    # the key is built from the query itself (method, dataset, table, line code, GeoFIPS, year range ...)
+    # parameter names are case insensitive in the BEA API, so they are normalized before hashing
+    query = sorted((str(name).lower(), str(value)) for name, value in params.items()
+                   if str(name).lower() not in IGNORED_PARAMS)
+    return hashlib.sha1(json.dumps(query).encode("utf-8")).hexdigest()
+
+
+def read_cached_response(cache_file, ttl=None):
+    # returns the cached json, or None when it is missing or older than ttl (ttl None means any age is fine)
+    try:
+        age = time.time() - cache_file.stat().st_mtime
+        if ttl is not None and age > ttl:
+            return None
+        with open(cache_file) as f:
+            response = json.load(f)["response"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # touching the file on every hit keeps the eviction order least recently used
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+    return response
+
+
+def write_cached_response(cache_dir, cache_file, params, response):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    query = {name: value for name, value in params.items() if str(name).lower() not in IGNORED_PARAMS}
+
+    # write to a temporary file first and rename, so concurrent workers never read half written json
+    fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"query": query, "fetched_at": time.time(), "response": response}, f)
+    os.replace(tmp_name, cache_file)
+
+
+def evict_cache(cache_dir, max_bytes):
+    # remove the least recently used responses until the folder is under the size bound
+    entries = []
+    for cache_file in cache_dir.glob("*.json"):
+        try:
+            stat = cache_file.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, cache_file))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, cache_file in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            cache_file.unlink()
+        except OSError:
+            continue
+        total_size -= size
+
+
+def bea_request(params, session=None, timeout=60, refresh=False):
+    # Returns the decoded json response of a BEA API query given as a dict of query parameters (including UserID)
+    # Fresh cached responses are returned without a network call. In offline mode a stale response is still used,
+    # and a missing one raises a LookupError. refresh=True always asks BEA (except in offline mode) and replaces the
+    # cached response, the background refresh uses it to look for new data.
+    settings = get_cache_settings()
+    cache_dir = settings["cache_dir"]
+    cache_file = cache_dir / (get_cache_key(params) + ".json")
+
+    if settings["offline"] or not refresh:
+        response = read_cached_response(cache_file, None if settings["offline"] else settings["ttl"])
+        if response is not None:
+            return response
+
+    if settings["offline"]:
+        raise LookupError(f"BEA_OFFLINE is set and there is no cached response for {cache_file.name} in {cache_dir}")
+
+    http = session if session is not None else requests
+    reply = http.get(settings["api_url"], params=params, timeout=timeout)
+    reply.raise_for_status()
+    response = reply.json()
+
+    # BEA reports query errors with a 200 status, those responses should not be cached
+    bea_results = response.get("BEAAPI", {})
+    if "Error" not in bea_results and "Error" not in bea_results.get("Results", {}):
+        write_cached_response(cache_dir, cache_file, params, response)
+        evict_cache(cache_dir, settings["max_bytes"])
+    return response
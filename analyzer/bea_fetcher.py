@@ -0,0 +1,95 @@
+# Concurrent fetcher for BEA Regional tables
+# Runs many GetData queries at the same time on a thread pool sharing one keep-alive session, retries failed queries
+# with exponential backoff and returns all the rows in one dataframe in the GeoName / TimePeriod / DataValue shape
+# used by the dashboard, with TableName and LineCode columns to tell the queries apart.
+#
+# The input arguments : bea_api_key - BEA API key
+#                       queries - list of dicts overriding DEFAULT_QUERY, e.g. {"TableName": "SQINC1", "LineCode": 3}
+#                       refresh - ask BEA even when the disk cache has a fresh response (analyzer.bea_cache)
+#
+# The function returns the combined dataframe and a dataframe with the wall time, attempts and row count of every query
+
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from analyzer.bea_cache import bea_request
+
+
+DEFAULT_QUERY = {"method": "GetData", "datasetname": "Regional", "GeoFIPS": "STATE", "Year": "LAST5",
+                 "ResultFormat": "JSON"}
+
+# commonly used state level series
+PERSONAL_INCOME_QUERY = {"TableName": "SQINC1", "LineCode": 1}
+POPULATION_QUERY = {"TableName": "SQINC1", "LineCode": 2}
+PER_CAPITA_INCOME_QUERY = {"TableName": "SQINC1", "LineCode": 3}
+GDP_ALL_INDUSTRY_QUERY = {"TableName": "SAGDP2N", "LineCode": 1}
+
+DATA_COLUMNS = ["TableName", "LineCode", "GeoFips", "GeoName", "TimePeriod", "DataValue"]
+
+# HTTP status codes worth retrying, anything else is a problem with the query itself
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(max_workers=8):
+    # one pooled session per process, so connections to BEA are kept alive between queries and reruns
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def fetch_query(bea_api_key, query, session, retries=3, backoff=1.0, timeout=60, refresh=False):
+    # run a single query with retries, returns its rows and timing
+    params = dict(DEFAULT_QUERY, UserID=bea_api_key, **query)
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            results = bea_request(params, session=session, timeout=timeout, refresh=refresh)["BEAAPI"]["Results"]
+            break
+        except requests.HTTPError as error:
+            if error.response is None or error.response.status_code not in RETRY_STATUS or attempt > retries:
+                raise
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt > retries:
+                raise
+        time.sleep(backoff * 2 ** (attempt - 1))
+
+    if "Error" in results:
+        raise ValueError(f"BEA rejected the query {query}: {results['Error']}")
+
+    rows = pd.DataFrame(results["Data"])
+    rows["TableName"] = params["TableName"]
+    rows["LineCode"] = params["LineCode"]
+    timing = {"TableName": params["TableName"], "LineCode": params["LineCode"], "GeoFIPS": params["GeoFIPS"],
+              "Year": params["Year"], "seconds": time.perf_counter() - start, "attempts": attempt, "rows": len(rows)}
+    return rows, timing
+
+
+def fetch_bea_tables(bea_api_key, queries, max_workers=8, retries=3, backoff=1.0, timeout=60, refresh=False):
+    session = get_session(max_workers)
+
+    # at most max_workers queries are in flight at any time
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch_query, bea_api_key, query, session, retries, backoff, timeout, refresh)
+                   for query in queries]
+        results = [future.result() for future in futures]
+
+    frames = [rows.reindex(columns=DATA_COLUMNS) for rows, _ in results]
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=DATA_COLUMNS)
+    timings = pd.DataFrame([timing for _, timing in results])
+    return combined, timings
@@ -0,0 +1,77 @@
+# Parsing of BEA data values, shared by the API responses and the csv files
+# BEA writes numbers with thousands separators ("52,345") and puts a footnote code in place of the number when a value
+# is suppressed or missing. The codes are not zeros: a county with (D) has income, it is just not published, so they
+# become NaN and the code itself is kept in a flag array for anyone who needs to know why a value is missing.
+#
+# parse_values converts a whole array of cells in one vectorized pass, numbers that are already numeric pass through.
+# parse_frame does the same for a set of columns of a frame, all its text columns are parsed together as one array.
+#
+# The flags are categoricals over FLAG_CODES (int8 codes, NaN for a reported value). Text that is neither a number nor
+# a known code gets the UNKNOWN_CODE flag, an empty cell gets (NA).
+
+
+import numpy as np
+import pandas as pd
+
+
+# footnote codes BEA uses in place of a number
+SUPPRESSION_CODES = {
+    "(NA)": "Not available",
+    "(L)": "Less than $50,000 or less than 10 jobs, included in the totals",
+    "(D)": "Not shown to avoid disclosure of confidential information, included in the totals",
+    "(NM)": "Not meaningful",
+    "(X)": "Not applicable",
+    "(S)": "Does not meet publication standards",
+}
+UNKNOWN_CODE = "(?)"
+FLAG_CODES = pd.Index(list(SUPPRESSION_CODES) + [UNKNOWN_CODE])
+
+
+def get_flags(flag_positions):
+    return pd.Categorical.from_codes(flag_positions, categories=FLAG_CODES)
+
+
+def parse_values(values):
+    # returns the values as a float64 array and their flags, both the length of values
+    # every distinct cell is parsed once, the codes and many of the values repeat across a table
+    cell_positions, distinct = pd.factorize(np.asarray(values, dtype=object).ravel())
+    distinct = pd.Series(distinct, dtype=object)
+
+    # cells that are not text (numbers already) stay as they are
+    is_text = np.fromiter((isinstance(cell, str) for cell in distinct.to_numpy()), dtype=bool, count=len(distinct))
+    text = distinct[is_text].str.replace(",", "", regex=False)
+    numbers = pd.to_numeric(distinct.mask(is_text, text), errors="coerce").to_numpy(dtype="float64")
+
+    # flags of the distinct cells that are not numbers, empty cells (and NaN) are not available
+    missing = np.flatnonzero(np.isnan(numbers))
+    missing_text = distinct.iloc[missing].map(lambda cell: cell.strip() if isinstance(cell, str) else "")
+    flag_positions = np.full(len(distinct) + 1, -1, dtype="int8")
+    positions = FLAG_CODES.get_indexer(missing_text).astype("int8")
+    positions[(positions < 0) & (missing_text == "").to_numpy()] = FLAG_CODES.get_loc("(NA)")
+    positions[positions < 0] = FLAG_CODES.get_loc(UNKNOWN_CODE)
+    flag_positions[missing] = positions
+
+    # position -1 (None or NaN cells) picks the extra last entry: NaN and not available
+    numbers = np.append(numbers, np.nan)
+    flag_positions[-1] = FLAG_CODES.get_loc("(NA)")
+    return numbers[cell_positions], get_flags(flag_positions[cell_positions])
+
+
+def parse_frame(frame, columns):
+    # returns a copy of frame with the columns as float64, and a frame with the flags of those columns
+    parsed = frame.copy()
+    flags = {}
+    text_columns = [column for column in columns if not pd.api.types.is_numeric_dtype(frame[column])]
+    if text_columns:
+        # column after column in one array
+        values, text_flags = parse_values(frame[text_columns].to_numpy(dtype=object).ravel(order="F"))
+        for i, column in enumerate(text_columns):
+            parsed[column] = values[i * len(frame):(i + 1) * len(frame)]
+            flags[column] = text_flags[i * len(frame):(i + 1) * len(frame)]
+
+    for column in columns:
+        if column not in flags:
+            values = frame[column].to_numpy(dtype="float64")
+            parsed[column] = values
+            flags[column] = get_flags(np.where(np.isnan(values), FLAG_CODES.get_loc("(NA)"), -1).astype("int8"))
+    return parsed, pd.DataFrame({column: flags[column] for column in columns}, index=frame.index)
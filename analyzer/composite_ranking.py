@@ -0,0 +1,86 @@
+# Composite ranking of geographies on many weighted metrics
+# Every metric (a column of a geographies x metrics frame) becomes a z-score across the geographies, oriented so that
+# higher is better: a direction of -1 flips the metrics where lower is better, e.g. the income level in the emerging
+# markets screen. The composite score of a geography is the weighted sum of its z-scores, one matrix-vector product
+# for the whole table. A geography without a value for a metric gets 0 for it, the average of the others.
+#
+# A weight change does not recompute the scores from scratch: update_scores adds the change of the changed weights
+# times the z-scores of those metrics to the previous scores. get_top_k picks the best geographies with a partial sort
+# (np.argpartition), only the K picked are ordered. sweep_weights scores many weight sets with one matrix product.
+#
+# build_ranking returns a dict with
+#   geographies, metrics - labels of the rows and columns of z
+#   z - float64 array of the oriented z-scores (geographies x metrics)
+# Weights are arrays in the order of the metrics, get_weights builds one from a dict (missing metrics weigh 0).
+
+
+import numpy as np
+import pandas as pd
+
+
+def build_ranking(metrics, directions=None):
+    values = metrics.to_numpy(dtype="float64")
+    if directions is not None:
+        values = values * pd.Series(directions, dtype="float64").reindex(metrics.columns).fillna(1).to_numpy()
+
+    # nan aware mean and standard deviation of every metric
+    present = ~np.isnan(values)
+    counts = np.maximum(present.sum(axis=0), 1)
+    filled = np.where(present, values, 0)
+    mean = filled.sum(axis=0) / counts
+    deviation = np.where(present, values - mean, 0)
+    std = np.sqrt((deviation ** 2).sum(axis=0) / counts)
+
+    # a metric with the same value everywhere does not separate the geographies, all its z-scores are 0
+    std[std == 0] = np.inf
+    return {
+        "geographies": metrics.index,
+        "metrics": metrics.columns,
+        "z": deviation / std,
+    }
+
+
+def get_weights(ranking, weights):
+    return np.array([float(weights.get(metric, 0)) for metric in ranking["metrics"]])
+
+
+def get_scores(ranking, weights):
+    return ranking["z"] @ weights
+
+
+def update_scores(ranking, scores, old_weights, new_weights):
+    # scores of new_weights from the scores of old_weights, only the changed metrics are read
+    changed = np.flatnonzero(new_weights != old_weights)
+    if len(changed) > len(new_weights) // 2:
+        return get_scores(ranking, new_weights)
+    return scores + ranking["z"][:, changed] @ (new_weights[changed] - old_weights[changed])
+
+
+def get_top_positions(scores, k):
+    # positions of the k highest scores along the first axis, highest first
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[0]).reshape((-1,) + (1,) * (scores.ndim - 1)), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0, kind="stable")
+    return np.take_along_axis(top, order, axis=0)
+
+
+def get_top_k(ranking, scores, k):
+    # composite score of the k best geographies, highest first
+    top = get_top_positions(scores, k)
+    return pd.Series(scores[top], index=ranking["geographies"][top], name="score")
+
+
+def sweep_weights(ranking, weight_sets, k):
+    # weight_sets - (sets x metrics) array. Returns the top k of every weight set (sweep, rank, geography, score)
+    scores = ranking["z"] @ np.asarray(weight_sets, dtype="float64").T
+    top = get_top_positions(scores, k)
+    sweep = np.broadcast_to(np.arange(scores.shape[1]), top.shape)
+    return pd.DataFrame({
+        "sweep": sweep.T.ravel(),
+        "rank": np.tile(np.arange(1, top.shape[0] + 1), top.shape[1]),
+        "geography": ranking["geographies"][top.T.ravel()],
+        "score": scores[top, sweep].T.ravel(),
+    })
@@ -0,0 +1,145 @@
+# Frames behind the dashboard charts, built once per data version and shared read only by every session
+# (analyzer.shared_data). A session only selects from them and builds its charts, it never assigns columns of them.
+#
+# get_income_dataset returns a dict with
+#   version - version of the personal income history it was built from, datasets derived from it are keyed on it
+#   first_year - first year of the five years shown
+#   first_quarter, latest_quarter - first and latest quarter of the five years (e.g. "2017Q1" and "2021Q2"), the default
+#                                   growth window of the charts and of the emerging markets screen
+#   annual - mean personal income of every state and year, indexed by the year end date (GeoName, DataValue)
+#   quarterly_wide - personal income with the first day of every quarter as index and the states as columns, the line
+#                    chart downsamples any window of it
+#   us_states - contiguous states with their postal code, latest personal income and hover text
+#   growth - growth from the first quarter to the latest quarter, sorted in ascending order (GeoName, 0)
+#   log_income - log of the personal income with the quarters ("2017Q1") as index and the states as columns, any
+#                growth window is read from it by get_income_growth
+#   income_vs_growth - latest personal income and growth of every contiguous state, sorted by income
+#   emerging_markets - result of screen_emerging_markets for the 20 lowest income and 8 target states
+#
+# get_industry_dataset returns a dict with industry_list, the sorted Description lines of the GDP table.
+#
+# get_composite_ranking returns the ranking (analyzer.composite_ranking) of the contiguous states on their income level
+# (lower ranks higher), income growth, population growth and the GDP per capita growth of every industry (one metric
+# per Description line), with the metrics frame behind it. The rankings of the last RANKING_VERSIONS windows (or data
+# versions) are kept, so sessions on different windows do not evict each other's ranking.
+
+
+import pandas as pd
+
+from analyzer.bea_fetcher import PER_CAPITA_INCOME_QUERY
+from analyzer.composite_ranking import build_ranking
+from analyzer.income_history import get_history_path
+from analyzer.industry_analysis import get_industry_growth
+from analyzer.ingest import GDP_CSV, POPULATION_CSV, load_gdp, load_population
+from analyzer.log_levels import to_log_levels, get_log_growth
+from analyzer.screening import LIST_OF_STATES, EXCLUDED_STATES, get_income_by_quarter, screen_emerging_markets
+from analyzer.shared_data import get_file_version, get_shared
+from analyzer.state_geo import get_state_lookup
+
+
+# rankings kept at the same time, one per data version and window
+RANKING_VERSIONS = 16
+
+
+def build_income_dataset(personal_income_history, income_aggregates, years=5, version=None):
+    # keep the last five years of the states and clip out the unnecessary columns
+    first_year = int(personal_income_history["TimePeriod"].max()[:4]) - (years - 1)
+    by_state = personal_income_history[(personal_income_history["TimePeriod"] >= f"{first_year}Q1")
+                                       & personal_income_history["GeoName"].isin(LIST_OF_STATES)]
+    by_state = by_state[["GeoName", "TimePeriod", "DataValue"]]
+    # the window rolls with the data, so the growth window of the charts and the screen is read from it
+    first_quarter = by_state["TimePeriod"].min()
+    latest_quarter = by_state["TimePeriod"].max()
+
+    annual = income_aggregates["annual"]
+    annual = annual[annual["GeoName"].isin(LIST_OF_STATES) & (annual["Year"] >= first_year)]
+    annual = annual.assign(TimePeriod=pd.to_datetime(annual["Year"].astype(str) + "-12-31").dt.date)
+    annual = annual.set_index("TimePeriod")[["GeoName", "DataValue"]]
+
+    # contiguous states with the latest personal income, the lookup is already sorted by state name
+    us_states = get_state_lookup().reset_index()
+    us_states = us_states[~us_states["GeoName"].isin(["Alaska", "Hawaii", "District of Columbia"])]
+    us_states = us_states.assign(DataValue=us_states["GeoName"].map(income_aggregates["latest"]["DataValue"]))
+    us_states["text"] = us_states["GeoName"] + "<br>" + "Per Capita PI = $" + us_states["DataValue"].astype(str)
+
+    growth = income_aggregates["growth"][first_quarter]
+    growth = growth[growth.index.isin(LIST_OF_STATES)]
+    growth = growth.reset_index(name=0).sort_values(by=0).reset_index(drop=True)
+
+    income_vs_growth = pd.DataFrame({"GeoName": growth["GeoName"], "Percent_Growth": growth[0]})
+    income_vs_growth = income_vs_growth.merge(us_states[["GeoName", "DataValue"]], how="inner", on="GeoName")
+    income_vs_growth = income_vs_growth.sort_values(by="DataValue")
+
+    income_by_quarter = get_income_by_quarter(by_state)
+    log_income = pd.DataFrame(to_log_levels(income_by_quarter), index=income_by_quarter.index.astype(str),
+                              columns=income_by_quarter.columns)
+
+    emerging_markets = screen_emerging_markets(None, bottom_n=20, top_k=8, start=first_quarter, end=latest_quarter,
+                                               income_by_quarter=income_by_quarter)
+
+    return {
+        "version": version,
+        "first_year": first_year,
+        "first_quarter": first_quarter,
+        "latest_quarter": latest_quarter,
+        "annual": annual,
+        "quarterly_wide": income_by_quarter.to_timestamp(),
+        "us_states": us_states,
+        "growth": growth,
+        "income_vs_growth": income_vs_growth,
+        "log_income": log_income,
+        "emerging_markets": emerging_markets,
+    }
+
+
+def get_income_dataset(personal_income_history, income_aggregates, query=PER_CAPITA_INCOME_QUERY):
+    # the history file is rewritten whenever a refresh adds or revises quarters
+    version = get_file_version(get_history_path(query, "history"))
+    return get_shared("income dataset", version, build_income_dataset, personal_income_history, income_aggregates, 5,
+                      version)
+
+
+def get_income_growth(income_dataset, start, end):
+    # growth of every state from the start to the end quarter, sorted in ascending order (GeoName, 0)
+    log_income = income_dataset["log_income"]
+    growth = get_log_growth(log_income.loc[start].to_numpy(), log_income.loc[end].to_numpy())
+    growth = pd.Series(growth, index=log_income.columns, name=0)
+    return growth.reset_index().sort_values(by=0).reset_index(drop=True)
+
+
+def build_industry_dataset():
+    return {"industry_list": load_gdp()["Description"].drop_duplicates().sort_values()}
+
+
+def get_industry_dataset():
+    return get_shared("industry dataset", get_file_version(GDP_CSV), build_industry_dataset)
+
+
+def build_state_metrics(income_dataset, growth_start, growth_end, start_year, end_year):
+    # one row per contiguous state, income growth over the quarters and the other growths over the years given
+    states = pd.Index([state for state in LIST_OF_STATES if state not in EXCLUDED_STATES], name="GeoName")
+    log_income = income_dataset["log_income"]
+    population = load_population().set_index("GeoName")
+    industry_growth, _ = get_industry_growth(tuple(states), start_year, end_year)
+
+    metrics = pd.DataFrame({
+        "Income level": income_dataset["quarterly_wide"].ffill().iloc[-1],
+        "Income growth": get_log_growth(log_income.loc[growth_start], log_income.loc[growth_end]),
+        "Population growth": pd.Series(get_log_growth(to_log_levels(population[str(start_year)]),
+                                                      to_log_levels(population[str(end_year)])),
+                                       index=population.index),
+    }).reindex(states)
+    return pd.concat([metrics, industry_growth.T.reindex(states)], axis=1)
+
+
+def build_composite_ranking(income_dataset, growth_start, growth_end, start_year, end_year):
+    metrics = build_state_metrics(income_dataset, growth_start, growth_end, start_year, end_year)
+    return dict(build_ranking(metrics, {"Income level": -1}), metric_values=metrics)
+
+
+def get_composite_ranking(income_dataset, growth_start, growth_end, start_year, end_year):
+    # keyed on the dataset it is built from, so a session still on the previous release gets the ranking of that release
+    version = (income_dataset["version"], get_file_version(GDP_CSV, POPULATION_CSV),
+               growth_start, growth_end, start_year, end_year)
+    return get_shared("composite ranking", version, build_composite_ranking, income_dataset, growth_start, growth_end,
+                      start_year, end_year, max_versions=RANKING_VERSIONS)
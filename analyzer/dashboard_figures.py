@@ -0,0 +1,130 @@
+# Figures of the personal income part of the dashboard, free of any Streamlit calls
+# The dashboard renders them with st.plotly_chart and the snapshot export (export_snapshot.py) writes them to static
+# files. The inputs are the frames of the shared income dataset (analyzer.dashboard_data).
+
+
+import plotly.express as px
+from plotly.subplots import make_subplots
+
+from analyzer.downsample import downsample_wide, to_typed_arrays
+from analyzer.state_geo import get_state_codes, get_choropleth
+
+
+# points per series of the line charts, more detail is shown by zooming into a smaller window
+MAX_LINE_POINTS = 300
+
+
+def add_cut_line(figure, states, y0, y1):
+    # dashdot line at the 21st state to seperate the 20 states on the left
+    figure.add_shape(type = 'line',
+                     x0 = states.iloc[20],
+                     y0 = y0,
+                     x1 = states.iloc[20],
+                     y1 = y1,
+                     line = dict(color = 'Red', width = 3, dash = 'dashdot'))
+
+
+def get_annual_income_figure(personal_income_filter_annual, time):
+    # bar chart of the states in ascending order for the selected year
+    df = personal_income_filter_annual.loc[time].sort_values('DataValue')
+    fig = px.bar(df,
+                 x = 'GeoName',
+                 y = 'DataValue' ,
+                 width = 1000,
+                 title = f'Annual Personal Income for all states in ascending order -{time}',
+                 labels = { 'GeoName': 'State', 'DataValue': 'Personal Income($)'}, # Axis labels to be displayed on the chart and while hovering
+                 color_discrete_sequence = ['pink']*len(personal_income_filter_annual))
+    add_cut_line(fig, df['GeoName'], -5000, max(df['DataValue']))
+    return fig
+
+
+def get_quarterly_income_figure(income_by_quarter, max_points=MAX_LINE_POINTS):
+    # Line plot for percapita personal income for all the states (columns) for all the fiscal quarters (index), or for
+    # the window of quarters it is given. Every series is downsampled to max_points and sent as typed arrays.
+    personal_income_melt = downsample_wide(income_by_quarter, max_points)
+    layout_plots_line = px.line(personal_income_melt,
+                                x='TimePeriod',
+                                y='value',
+                                color = 'GeoName',
+                                width = 1000,
+                                height = 800,
+                                labels = { 'TimePeriod': 'Fiscal Quarter', 'value': 'Personal Income($)', 'GeoName':'State'},
+                                title = "5 year Personal Income for all states")
+    return to_typed_arrays(layout_plots_line)
+
+
+def get_income_map_figure(us_states_df, latest_quarter):
+    # Generate the choropleth map from the cached template, only the values and hover text change
+    return get_choropleth(us_states_df['code'], # Spatial coordinates
+                          us_states_df['DataValue'], # Data to be color-coded
+                          colorscale = 'blackbody',
+                          colorbar_title = "USD",
+                          title_text = f" Map of US with Personal Income in {latest_quarter[-2:]} of {latest_quarter[:4]}",
+                          text = us_states_df['text']) # hover text
+
+
+def get_income_growth_figure(personal_income_growth, growth_start, growth_end, bar_count):
+    fig2 = px.bar(personal_income_growth,
+                  x = 'GeoName',
+                  y = 0,
+                  width = 1000,
+                  title = f"Percent growth personal income {growth_start} to {growth_end} sorted in ascending order",
+                  labels = { 'GeoName': 'State', '0' : 'Percent Personal Income Growth(%)'}, # Axis labels to be displayed on the chart and while hovering
+                  color_discrete_sequence = ['pink']*bar_count)
+    add_cut_line(fig2, personal_income_growth['GeoName'], -2, 30)
+    return fig2
+
+
+def get_income_with_growth_figure(personal_income_vs_percentage_growth, first_quarter, latest_quarter):
+    # Define a subplot figure to plot both the graphs together
+    sub_fig = make_subplots(specs = [[{"secondary_y": True}]])
+
+    # First generate the line figure for percentage growth
+    fig3 = px.line(x = personal_income_vs_percentage_growth['GeoName'],
+                   y = personal_income_vs_percentage_growth['Percent_Growth'],
+                   color_discrete_sequence = ['red']*len(personal_income_vs_percentage_growth))
+
+    # Define a figure for plotting the bar graph for Per Capita Personal Income
+    fig4 = px.bar(x = personal_income_vs_percentage_growth['GeoName'],
+                  y = personal_income_vs_percentage_growth['DataValue'] ,
+                  color_discrete_sequence = ['pink']*len(personal_income_vs_percentage_growth),
+                  width = 1000)
+
+    # Define second axis for percent growth and define mode to plot markers alongwith the line graph
+    fig3.update_traces(yaxis = "y2",mode='markers+lines')
+
+    # Add both the figures on the sub plot figure
+    sub_fig.add_traces(fig4.data + fig3.data)
+    sub_fig.update_layout(width = 1000, height = 500, title_text = " Personal Income with Percentage Growth")
+    sub_fig.layout.xaxis.title = "State"
+    sub_fig.layout.yaxis.title = f" Personal Income for {latest_quarter}"
+    sub_fig.layout.yaxis2.title = f"Percentage Growth from {first_quarter} to {latest_quarter}"
+    return sub_fig
+
+
+def get_low_income_growth_figure(personal_income_growth_lower_end, first_quarter, latest_quarter):
+    #plot growth in the 5 year timeframe in personal incomes for bottom 20 states in personal income
+    fig5 = px.bar(personal_income_growth_lower_end,
+                  labels = {'GeoName' : 'State', 'value': f'Percent Growth Personal Incomes {first_quarter[:4]}-{latest_quarter}' },
+                  color_discrete_sequence = ['pink']*len(personal_income_growth_lower_end),
+                  width = 1000)
+    fig5.update_layout(title_text = f"Percent Growth in Personal Income {first_quarter[:4]}-{latest_quarter} for 20 States with lowest Personal Income", showlegend = False )
+    return fig5
+
+
+def get_target_states_figure(targets, first_quarter, latest_quarter):
+    return get_choropleth(get_state_codes(targets.index), # Spatial coordinates
+                          targets, # Data to be color-coded
+                          colorscale = 'viridis',
+                          colorbar_title = "Percentage",
+                          title_text = f" Map of US with target states and their percent growth from {first_quarter} - {latest_quarter}")
+
+
+def get_composite_ranking_figure(top_states):
+    # composite score of the top states, the best one on the right
+    fig7 = px.bar(top_states.sort_values(),
+                  labels = {'GeoName': 'State', 'value': 'Composite score (weighted z-scores)'},
+                  color_discrete_sequence = ['pink']*len(top_states),
+                  width = 1000)
+    fig7.update_layout(title_text = f"Top {len(top_states)} states by composite score", showlegend = False)
+    return fig7
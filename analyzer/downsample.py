@@ -0,0 +1,76 @@
+# Downsampling and compact encoding of time series for the line charts
+# Largest-Triangle-Three-Buckets (LTTB) keeps max_points of every series: the first and last points, and in each bucket
+# between them the point forming the largest triangle with the point kept before it and the mean of the next bucket,
+# so peaks and dips survive. All the series of a chart share the same periods, so the buckets are the same for every
+# series and each bucket is one vectorized step over all of them (3,000 counties cost about as much as 50 states).
+#
+# Zooming in is a smaller window of periods downsampled to the same max_points, so the detail grows with the zoom level
+# while the payload per series stays bounded.
+#
+# to_typed_arrays turns the dates of the line traces into epoch milliseconds, with the values already numpy arrays
+# Plotly then sends both as binary typed arrays instead of one json string or number per point.
+
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_positions(x, values, max_points):
+    # x - (n,) increasing floats, values - (n, m) array of m series. Returns (max_points, m) row positions
+    n, series_count = values.shape
+    if max_points >= n or max_points < 3:
+        return np.repeat(np.arange(n)[:, np.newaxis], series_count, axis=1)
+
+    # missing values never win a bucket
+    filled = np.where(np.isnan(values), np.nanmean(values, axis=0), values)
+    filled = np.nan_to_num(filled)
+
+    # bucket edges of the n - 2 points between the first and the last one
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    positions = np.empty((max_points, series_count), dtype=int)
+    positions[0] = 0
+    positions[-1] = n - 1
+    columns = np.arange(series_count)
+
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # mean of the next bucket (the last point for the last bucket)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:max(next_end, next_start + 1)].mean()
+        next_y = filled[next_start:max(next_end, next_start + 1)].mean(axis=0)
+
+        previous_x = x[positions[bucket]]
+        previous_y = filled[positions[bucket], columns]
+        # twice the area of the triangles (previous point, candidate, next bucket mean) for every candidate and series
+        area = np.abs((previous_x - next_x) * (filled[start:end] - previous_y)
+                      - (previous_x[np.newaxis, :] - x[start:end, np.newaxis]) * (next_y - previous_y))
+        positions[bucket + 1] = start + area.argmax(axis=0)
+    return positions
+
+
+def downsample_wide(wide, max_points):
+    # wide - periods (dates) as index and one column per series. Returns the kept points in long format
+    # (TimePeriod, GeoName, value), series after series like DataFrame.melt
+    x = wide.index.values.astype("datetime64[ms]").astype("float64")
+    values = wide.to_numpy(dtype="float64")
+    positions = lttb_positions(x, values, max_points)
+
+    series_count = values.shape[1]
+    columns = np.repeat(np.arange(series_count), positions.shape[0])
+    rows = positions.T.ravel()
+    return pd.DataFrame({
+        "TimePeriod": wide.index.values[rows],
+        "GeoName": wide.columns.values[columns],
+        "value": values[rows, columns],
+    })
+
+
+def to_typed_arrays(figure):
+    # epoch milliseconds on a date axis instead of date strings
+    for trace in figure.data:
+        if trace.x is not None and np.asarray(trace.x).dtype.kind in "Mm":
+            trace.x = np.asarray(trace.x).astype("datetime64[ms]").astype("float64")
+        if trace.y is not None:
+            trace.y = np.asarray(trace.y, dtype="float64")
+    figure.update_xaxes(type="date")
+    return figure
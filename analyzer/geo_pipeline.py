@@ -0,0 +1,100 @@
+# Long format pipeline for any BEA geography level (state, county or metro area)
+# The rows are keyed by integer FIPS codes and integer period codes instead of GeoName strings, and the frames are
+# never unstacked into one column per geography, so memory and run time grow linearly with the number of
+# geographies (about 3,100 counties and 380 metro areas).
+#
+# load_geo_level returns a dict with
+#   long - one row per geography and period: geo_id (int FIPS), period (int code), DataValue and DataFlag (the BEA
+#          footnote code of a suppressed value, NaN for a reported one, see analyzer.bea_values)
+#   periods - the TimePeriod labels of the period codes, in time order
+#   geo_names - GeoName of every geo_id
+# screen_geographies runs the emerging markets screen on it and returns the growth of the bottom_n geographies
+# by income and the top_k of them by growth, both indexed by GeoName.
+
+
+import pandas as pd
+
+from analyzer.bea_fetcher import fetch_bea_tables
+from analyzer.bea_values import parse_values
+
+
+# per capita personal income at each level. county and metro area data is annual
+GEO_LEVELS = {
+    "state": {"TableName": "SQINC1", "LineCode": 3, "GeoFIPS": "STATE"},
+    "county": {"TableName": "CAINC1", "LineCode": 3, "GeoFIPS": "COUNTY"},
+    "msa": {"TableName": "CAINC1", "LineCode": 3, "GeoFIPS": "MSA"},
+}
+
+
+def keep_level_rows(geo_id, level):
+    # BEA adds the US total (00000) to every table, state totals (ss000) to county tables, regions (91000-98000)
+    # to state tables and the metropolitan and nonmetropolitan portions (00998, 00999) to metro area tables
+    if level == "county":
+        return geo_id % 1000 != 0
+    if level == "state":
+        return (geo_id % 1000 == 0) & (geo_id > 0) & (geo_id < 90000)
+    return geo_id >= 1000
+
+
+def to_long_frame(rows, level):
+    geo_id = pd.to_numeric(rows["GeoFips"], errors="coerce")
+    rows = rows[geo_id.notna().to_numpy()]
+    geo_id = geo_id.dropna().astype("int64").to_numpy()
+    keep = keep_level_rows(geo_id, level)
+    rows = rows[keep]
+    geo_id = geo_id[keep]
+
+    # suppressed values such as (NA) or (D) become NaN, their code goes to DataFlag
+    values, flags = parse_values(rows["DataValue"])
+
+    # TimePeriod labels ("2019" or "2019Q3") sort in time order, their positions become the period codes
+    periods = pd.Categorical(rows["TimePeriod"])
+
+    long = pd.DataFrame({
+        "geo_id": geo_id.astype("int32"),
+        "period": periods.codes.astype("int16"),
+        "DataValue": values,
+        "DataFlag": flags,
+    })
+    geo_names = pd.Series(rows["GeoName"].to_numpy(), index=geo_id).groupby(level=0).first()
+    return {"long": long, "periods": pd.Index(periods.categories), "geo_names": geo_names}
+
+
+def load_geo_level(bea_api_key, level, years="LAST5"):
+    rows, _ = fetch_bea_tables(bea_api_key, [dict(GEO_LEVELS[level], Year=years)])
+    return to_long_frame(rows, level)
+
+
+def get_period_values(geo_data, period):
+    # values of every geography in one period, indexed by geo_id
+    long = geo_data["long"]
+    rows = long[long["period"].to_numpy() == geo_data["periods"].get_loc(str(period))]
+    return pd.Series(rows["DataValue"].to_numpy(), index=rows["geo_id"].to_numpy())
+
+
+def get_growth(geo_data, start, end):
+    # percent growth of every geography from the start period to the end period, aligned on the integer keys
+    return ((get_period_values(geo_data, end) / get_period_values(geo_data, start)) - 1) * 100
+
+
+def screen_geographies(geo_data, bottom_n=300, top_k=25, start=None, end=None):
+    periods = geo_data["periods"]
+    if len(periods) == 0:
+        # BEA returned no rows for this level
+        empty = pd.Series([], dtype="float64", index=pd.Index([], dtype=object, name="GeoName"))
+        return {"bottom_growth": empty, "targets": empty.copy(), "start": start, "end": end}
+    start = periods[0] if start is None else start
+    end = periods[-1] if end is None else end
+
+    latest_income = get_period_values(geo_data, end).dropna()
+    growth = get_growth(geo_data, start, end).dropna()
+
+    # partial sorts, only the bottom_n and top_k are ordered
+    lowest = latest_income.nsmallest(bottom_n).index
+    bottom_growth = growth.reindex(lowest).dropna().sort_values()
+    targets = bottom_growth.nlargest(top_k).sort_values()
+
+    geo_names = geo_data["geo_names"]
+    bottom_growth.index = geo_names.reindex(bottom_growth.index).rename("GeoName")
+    targets.index = geo_names.reindex(targets.index).rename("GeoName")
+    return {"bottom_growth": bottom_growth, "targets": targets, "start": start, "end": end}
@@ -0,0 +1,156 @@
+# Incremental refresh of a quarterly BEA series (personal income per capita by state by default)
+# The rows are kept in a local history file next to the BEA response cache. A refresh only asks BEA for the years from
+# the latest year in the history onwards, appends the new quarters (and any revised values) to the history, and
+# recomputes only the aggregates those quarters affect. The history can therefore grow past five years without making
+# each refresh slower.
+#
+# refresh_income_history returns the full history (GeoFips, GeoName, TimePeriod, DataValue, DataFlag) and the
+# quarters that were added or revised. DataFlag is the BEA footnote code of a suppressed value (analyzer.bea_values),
+# NaN for a reported one. update_income_aggregates returns a dict with
+#   annual - mean value of every geography for every year (GeoName, Year, DataValue)
+#   latest - value in the latest quarter, indexed by GeoName (TimePeriod, DataValue)
+#   growth - percent growth from every quarter (columns, e.g. "2017Q1") to the latest quarter, indexed by GeoName
+
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from analyzer.bea_cache import get_cache_settings
+from analyzer.bea_fetcher import fetch_bea_tables, PER_CAPITA_INCOME_QUERY
+from analyzer.bea_values import FLAG_CODES, get_flags, parse_values
+from analyzer.ingest import get_compiled_path, read_compiled, write_compiled
+
+
+HISTORY_COLUMNS = ["GeoFips", "GeoName", "TimePeriod", "DataValue"]
+HISTORY_KEY = ["GeoFips", "TimePeriod"]
+
+
+def get_history_name(query):
+    return f"{query['TableName']}-{query['LineCode']}-{query.get('GeoFIPS', 'STATE')}"
+
+
+def get_history_path(query, kind="history"):
+    return get_compiled_path(f"{get_history_name(query)}-{kind}", get_cache_settings()["cache_dir"] / "history")
+
+
+def read_history_file(query, kind):
+    history_path = get_history_path(query, kind)
+    if not history_path.exists():
+        return None
+    history = read_compiled(history_path)
+    if kind == "history" and "DataFlag" not in history:
+        # history written before the flags were kept, its missing values can only be marked as not available
+        history["DataFlag"] = get_flags(np.where(history["DataValue"].isna(), FLAG_CODES.get_loc("(NA)"), -1))
+    return history
+
+
+def get_changed_periods(new_rows, history):
+    # quarters with rows that are new or have a different value or flag than the history
+    # suppressed values are NaN on both sides, they only count as changed when one side has a number or the code
+    # changed, e.g. from (D) to (NA)
+    compare = new_rows.merge(history, on=HISTORY_KEY, how="left", suffixes=("", "_history"), indicator=True)
+    new_flags = compare["DataFlag"].astype(object).fillna("")
+    history_flags = compare["DataFlag_history"].astype(object).fillna("")
+    revised = (((compare["DataValue"] != compare["DataValue_history"])
+                & ~(compare["DataValue"].isna() & compare["DataValue_history"].isna()))
+               | ((compare["_merge"] == "both") & (new_flags != history_flags)))
+    changed = (compare["_merge"] == "left_only") | revised
+    return sorted(compare.loc[changed, "TimePeriod"].unique())
+
+
+def refresh_income_history(bea_api_key, query=PER_CAPITA_INCOME_QUERY, first_load_years="LAST5", refresh=False):
+    history = read_history_file(query, "history")
+
+    if history is None or history.empty:
+        fetch_years = first_load_years
+    else:
+        # LASTn counts back from the latest year BEA has published, so this covers the latest year in the history
+        # (new quarters and revisions of it) and every year published since
+        latest_year = int(history["TimePeriod"].max()[:4])
+        fetch_years = f"LAST{max(1, datetime.date.today().year - latest_year + 1)}"
+
+    # refresh=True skips the cached BEA response, to see quarters published since it was cached
+    new_rows, _ = fetch_bea_tables(bea_api_key, [dict(query, Year=fetch_years)], refresh=refresh)
+    new_rows = new_rows[HISTORY_COLUMNS].copy()
+    new_rows["DataValue"], new_rows["DataFlag"] = parse_values(new_rows["DataValue"])
+
+    if history is None or history.empty:
+        history = new_rows
+        changed_periods = sorted(new_rows["TimePeriod"].unique())
+    else:
+        changed_periods = get_changed_periods(new_rows, history)
+        if changed_periods:
+            history = pd.concat([history, new_rows], ignore_index=True)
+            history = history.drop_duplicates(HISTORY_KEY, keep="last")
+
+    if changed_periods:
+        history = history.sort_values(["GeoName", "TimePeriod"]).reset_index(drop=True)
+        write_compiled(history, get_history_path(query, "history"))
+    return history, changed_periods
+
+
+def compute_annual(history, years=None):
+    rows = history if years is None else history[history["TimePeriod"].str[:4].astype(int).isin(years)]
+    annual = rows.groupby(["GeoName", rows["TimePeriod"].str[:4].astype(int).rename("Year")])["DataValue"].mean()
+    return annual.reset_index()
+
+
+def compute_latest(history):
+    latest_period = history["TimePeriod"].max()
+    return history[history["TimePeriod"] == latest_period].set_index("GeoName")[["TimePeriod", "DataValue"]]
+
+
+def compute_growth(history, latest, periods=None):
+    # growth from the given quarters (all quarters when None) to the latest quarter of every geography
+    rows = history if periods is None else history[history["TimePeriod"].isin(periods)]
+    by_quarter = rows.pivot_table(index="GeoName", columns="TimePeriod", values="DataValue", aggfunc="last")
+    growth = (by_quarter.rdiv(latest["DataValue"], axis=0) - 1) * 100
+    growth.columns.name = None
+    return growth
+
+
+def is_older_than_history(query, kind):
+    return get_history_path(query, kind).stat().st_mtime_ns < get_history_path(query, "history").stat().st_mtime_ns
+
+
+def update_income_aggregates(query, history, changed_periods):
+    annual = read_history_file(query, "annual")
+    latest = read_history_file(query, "latest")
+    growth = read_history_file(query, "growth")
+    if annual is not None and latest is not None and growth is not None and not changed_periods:
+        if not any(is_older_than_history(query, kind) for kind in ["annual", "latest", "growth"]):
+            return {"annual": annual, "latest": latest.set_index("GeoName"), "growth": growth.set_index("GeoName")}
+        # a refresh saved the history but failed before all its aggregates were saved, they are computed again
+        annual = latest = growth = None
+
+    if annual is None or latest is None or growth is None:
+        # first run, nothing to update incrementally
+        annual = compute_annual(history)
+        latest = compute_latest(history)
+        growth = compute_growth(history, latest)
+    else:
+        latest = latest.set_index("GeoName")
+        growth = growth.set_index("GeoName")
+
+        # only the years with new or revised quarters get a new annual mean
+        changed_years = sorted({int(period[:4]) for period in changed_periods})
+        annual = pd.concat([annual[~annual["Year"].isin(changed_years)], compute_annual(history, changed_years)])
+        annual = annual.sort_values(["GeoName", "Year"]).reset_index(drop=True)
+
+        # a new latest quarter (or a revision of it) changes the growth from every quarter,
+        # otherwise only the growth from the revised quarters changes
+        new_latest = compute_latest(history)
+        if new_latest["TimePeriod"].iloc[0] != latest["TimePeriod"].iloc[0] or latest["TimePeriod"].iloc[0] in changed_periods:
+            growth = compute_growth(history, new_latest)
+        else:
+            growth = growth.drop(columns=list(changed_periods), errors="ignore")
+            growth = growth.join(compute_growth(history, new_latest, changed_periods), how="outer")
+            growth = growth[sorted(growth.columns)]
+        latest = new_latest
+
+    write_compiled(annual, get_history_path(query, "annual"))
+    write_compiled(latest.reset_index(), get_history_path(query, "latest"))
+    write_compiled(growth.rename_axis("GeoName").reset_index(), get_history_path(query, "growth"))
+    return {"annual": annual, "latest": latest, "growth": growth}
@@ -0,0 +1,93 @@
+# Compute API for the industry analysis, free of any Streamlit calls
+# Results are memoized per process on (industry, set of states, year window, data version), so Streamlit reruns, batch
+# jobs and benchmarks reuse them instead of recomputing. Rendering is done separately by analyzer.plot_industry_analysis.
+# One cube of every year in the GDP table (1997-2020) is built per version of the GDP and population csv files and
+# shared read only by every session (analyzer.shared_data), any year window is sliced from it and its growth is a
+# difference of precomputed log levels. GDP per capita starts with the population data (2010). A changed csv file is a
+# new version: the cube is rebuilt and the results memoized for the previous version are no longer used.
+#
+# The input arguments : industry - Description line of the GDP table to be analyzed
+#                       states - target states (any iterable, order does not matter)
+#                       start_year, end_year - year window of the charts and the growth ranking, end_year - 1 is
+#                                              used when end_year is missing for any of the states
+#
+# industry_analysis returns a dict with
+#   industry, years_text - the industry and the window actually used for the growth, e.g. "2016 - 2019"
+#   gdp_capita - long table of GDP per capita (GeoName, Date, Value, Description) for the faceted chart
+#   unstacked - GDP per capita with the years as index and ("Value", state) columns
+#   growth_rank - percent growth of each state, sorted in ascending order
+# The returned frames are shared between callers and must not be modified.
+
+
+from functools import lru_cache
+
+import pandas as pd
+
+from analyzer.ingest import GDP_CSV, POPULATION_CSV, load_gdp, load_population
+from analyzer.industry_engine import build_industry_cube, compute_growth, get_growth_years, select_states
+from analyzer.instrumentation import record_miss
+from analyzer.shared_data import get_file_version, get_shared
+
+
+def get_industry_version():
+    return get_file_version(GDP_CSV, POPULATION_CSV)
+
+
+def build_industry_data_cube():
+    population_by_state = load_population().set_index("GeoName")
+    return build_industry_cube(load_gdp(), population_by_state)
+
+
+def get_industry_cube():
+    return get_shared("industry cube", get_industry_version(), build_industry_data_cube)
+
+
+def get_industry_years():
+    # years a GDP per capita window can start or end in
+    return [int(year) for year in get_growth_years(get_industry_cube())]
+
+
+@lru_cache(maxsize=32)
+def _get_industry_growth(states, start_year, end_year, version):
+    return compute_growth(get_industry_cube(), list(states), str(start_year), str(end_year), str(int(end_year) - 1))
+
+
+def get_industry_growth(states, start_year, end_year):
+    # growth of every industry for one state set and window, shared by all the industries analyzed with it
+    return _get_industry_growth(states, start_year, end_year, get_industry_version())
+
+
+@lru_cache(maxsize=256)
+def _industry_analysis(industry, states, start_year, end_year, version):
+    record_miss(f"industry analysis {industry.strip()}")
+    industry_cube = get_industry_cube()
+    growth, growth_end_year = get_industry_growth(states, start_year, end_year)
+
+    industry_position = industry_cube["industries"].get_loc(industry)
+    state_positions = select_states(industry_cube, states)
+    window = slice(industry_cube["years"].index(str(start_year)), industry_cube["years"].index(str(end_year)) + 1)
+
+    # slice the precomputed per capita values for this industry and window, rows are years and columns are states
+    gdp_capita_values = industry_cube["per_capita"][industry_position][state_positions, window].T
+    unstacked = pd.DataFrame(gdp_capita_values,
+                             index=pd.Index(industry_cube["years"][window], name="Date"),
+                             columns=industry_cube["states"][state_positions])
+    unstacked = pd.concat({"Value": unstacked}, axis=1)
+
+    # long format around GeoName and Date for the faceted bar chart
+    gdp_capita = unstacked["Value"].reset_index().melt("Date", var_name="GeoName", value_name="Value")
+    gdp_capita = gdp_capita[["GeoName", "Date", "Value"]]
+    gdp_capita["Description"] = industry
+
+    return {
+        "industry": industry,
+        "years_text": f"{start_year} - {growth_end_year[industry]}",
+        "gdp_capita": gdp_capita,
+        "unstacked": unstacked,
+        "growth_rank": growth.loc[industry].sort_values(),
+    }
+
+
+def industry_analysis(industry, states, start_year=2016, end_year=2020):
+    # the state set is normalized so the same states in any order share one cached result
+    return _industry_analysis(industry, tuple(sorted(states)), int(start_year), int(end_year), get_industry_version())
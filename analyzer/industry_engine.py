@@ -0,0 +1,93 @@
+# Vectorized engine for GDP per capita by industry
+# Builds one industry x state x year array of GDP per capita for every Description line and every state in a single
+# pass, so the charts only slice the precomputed result instead of grouping, dividing, melting and unstacking
+# once per industry. The cube also keeps the log of both arrays, so the growth over any window of years is a lookup of
+# two log levels and a vectorized difference (analyzer.log_levels).
+#
+# The input arguments : gdp - GDP by state and industry with GeoName, Description and year columns (millions of dollars)
+#                       population_by_state - population with GeoName as index and year columns
+#                       years - year columns to include, all year columns of gdp when None. Years without population
+#                               data have NaN GDP per capita
+#
+# build_industry_cube returns a dict with the industries, states and years labelling the three axes, the gdp and
+# per_capita arrays and their log_gdp and log_per_capita. compute_growth returns the percent growth of every industry in
+# every state.
+
+
+import numpy as np
+import pandas as pd
+
+from analyzer.ingest import get_year_columns
+from analyzer.log_levels import to_log_levels, get_log_growth
+
+
+def build_industry_cube(gdp, population_by_state, years=None):
+    years = [str(year) for year in (get_year_columns(gdp) if years is None else years)]
+
+    # states need both GDP and population data
+    states = pd.Index(sorted(set(gdp["GeoName"]) & set(population_by_state.index)), name="GeoName")
+    industries = pd.Index(sorted(gdp["Description"].unique()), name="Description")
+
+    # align every (industry, state) pair on a full grid, missing pairs become NaN
+    grid = pd.MultiIndex.from_product([industries, states])
+    gdp_values = (gdp.set_index(["Description", "GeoName"])[years]
+                     .reindex(grid)
+                     .to_numpy(dtype="float64")
+                     .reshape(len(industries), len(states), len(years)))
+
+    population_values = population_by_state.reindex(index=states, columns=years).to_numpy(dtype="float64")
+
+    # one broadcast divide for all industries, GDP is in millions of dollars
+    per_capita = gdp_values / population_values[np.newaxis, :, :] * 1000000
+
+    return {
+        "industries": industries,
+        "states": states,
+        "years": years,
+        "gdp": gdp_values,
+        "per_capita": per_capita,
+        "log_gdp": to_log_levels(gdp_values),
+        "log_per_capita": to_log_levels(per_capita),
+    }
+
+
+def select_states(industry_cube, states=None):
+    # positions of the requested states on the state axis (in alphabetical order), all states when None
+    if states is None:
+        return np.arange(len(industry_cube["states"]))
+    state_positions = industry_cube["states"].get_indexer(list(states))
+    if (state_positions < 0).any():
+        missing = [state for state, position in zip(states, state_positions) if position < 0]
+        raise KeyError(f"No GDP or population data for {missing}")
+    return np.sort(state_positions)
+
+
+def get_growth_years(industry_cube, measure="per_capita"):
+    # years with data for at least one industry and state, GDP per capita starts with the population data
+    has_data = ~np.isnan(industry_cube[f"log_{measure}"]).all(axis=(0, 1))
+    return [year for year, year_has_data in zip(industry_cube["years"], has_data) if year_has_data]
+
+
+def compute_growth(industry_cube, states=None, start_year="2016", end_year="2020", fallback_year="2019",
+                   measure="per_capita"):
+    # percent growth of GDP per capita (or GDP with measure="gdp") from start_year to end_year for every industry in
+    # the selected states. if the end_year value is missing (NaN or 0) for any selected state in an industry, that
+    # industry falls back to fallback_year, the same rule the industry charts have always used.
+    years = industry_cube["years"]
+    state_positions = select_states(industry_cube, states)
+    log_levels = industry_cube[f"log_{measure}"][:, state_positions, :]
+
+    start = log_levels[:, :, years.index(str(start_year))]
+    end = log_levels[:, :, years.index(str(end_year))]
+    fallback = log_levels[:, :, years.index(str(fallback_year))]
+
+    end_missing = np.isnan(end)
+    use_fallback = end_missing.any(axis=1)
+    end = np.where(use_fallback[:, np.newaxis], fallback, end)
+
+    growth = get_log_growth(start, end)
+
+    growth = pd.DataFrame(growth, index=industry_cube["industries"], columns=industry_cube["states"][state_positions])
+    growth_end_year = pd.Series(np.where(use_fallback, str(fallback_year), str(end_year)),
+                                index=industry_cube["industries"])
+    return growth, growth_end_year
@@ -0,0 +1,124 @@
+# Ingest step for the csv files in Resources
+# The raw BEA GDP csv and the census population csv are parsed once into typed columnar files in Resources/compiled,
+# so the dashboard loads them on every rerun without parsing csv text or casting columns.
+#
+# Year columns are stored as float64, parsed by analyzer.bea_values so the BEA footnote codes ("(NA)", "(L)", "(D)"...)
+# become missing values (NaN) instead of strings or zeros, and the repeated text columns are stored as categoricals.
+# The codes themselves are kept in a second compiled file per table (<name>-flags), one categorical flag column per year
+# column next to the key columns of the table, in the same row order. load_gdp_flags and load_population_flags load it.
+# Files are written in the feather format (memory mapped on load) when pyarrow is installed, otherwise as pickles.
+# A compiled file is rebuilt automatically whenever its source csv is newer. Every writer goes through a temporary file
+# of its own in the same folder and renames it, so processes rebuilding the same file at once never read or move a half
+# written one.
+#
+# Run "python -m analyzer.ingest" to (re)build the compiled files ahead of time.
+
+
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from analyzer.bea_values import parse_frame
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+RESOURCES = Path(__file__).resolve().parent.parent / "Resources"
+COMPILED = RESOURCES / "compiled"
+
+GDP_CSV = RESOURCES / "GDP_ALL_AREAS_1997_2020.csv"
+POPULATION_CSV = RESOURCES / "pop_2010_2020.csv"
+
+# repeated metadata columns stored as categoricals, GeoName and Description stay plain strings for filtering and joins
+GDP_CATEGORY_COLUMNS = ["TableName", "IndustryClassification", "Unit"]
+
+
+def get_year_columns(frame):
+    return [column for column in frame.columns if str(column).isdigit()]
+
+
+def read_gdp_csv(csv_path=GDP_CSV):
+    # returns the table and the flags of its year columns. year columns with a footnote code are read as text, all of
+    # them are parsed in one pass
+    gdp = pd.read_csv(csv_path)
+    gdp, flags = parse_frame(gdp, get_year_columns(gdp))
+    gdp[GDP_CATEGORY_COLUMNS] = gdp[GDP_CATEGORY_COLUMNS].astype("category")
+    return gdp, pd.concat([gdp[["GeoName", "Description"]], flags], axis=1)
+
+
+def read_population_csv(csv_path=POPULATION_CSV):
+    population = pd.read_csv(csv_path)
+    population, flags = parse_frame(population, get_year_columns(population))
+    return population, pd.concat([population[["GeoName"]], flags], axis=1)
+
+
+def get_compiled_path(name, folder=COMPILED):
+    return Path(folder) / (name + (".feather" if feather is not None else ".pkl"))
+
+
+def write_compiled(frame, compiled_path):
+    compiled_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=compiled_path.parent, prefix=compiled_path.name, suffix=".tmp")
+    os.close(fd)
+    try:
+        if feather is not None:
+            # uncompressed so the file can be memory mapped without decoding
+            feather.write_feather(frame, tmp_name, compression="uncompressed")
+        else:
+            frame.to_pickle(tmp_name)
+        os.replace(tmp_name, compiled_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def read_compiled(compiled_path):
+    if feather is not None:
+        return feather.read_feather(compiled_path, memory_map=True)
+    return pd.read_pickle(compiled_path)
+
+
+def write_compiled_table(name, csv_path, reader):
+    frame, flags = reader(csv_path)
+    write_compiled(flags, get_compiled_path(name + "-flags"))
+    write_compiled(frame, get_compiled_path(name))
+
+
+def load_compiled(name, csv_path, reader, flags=False):
+    # returns the compiled frame (or its flags), building both first if either is missing or older than the csv
+    compiled_paths = [get_compiled_path(name), get_compiled_path(name + "-flags")]
+    if any(not path.exists() or path.stat().st_mtime < csv_path.stat().st_mtime for path in compiled_paths):
+        write_compiled_table(name, csv_path, reader)
+    return read_compiled(compiled_paths[1] if flags else compiled_paths[0])
+
+
+def load_gdp():
+    return load_compiled("gdp_all_areas", GDP_CSV, read_gdp_csv)
+
+
+def load_gdp_flags():
+    return load_compiled("gdp_all_areas", GDP_CSV, read_gdp_csv, flags=True)
+
+
+def load_population():
+    return load_compiled("population", POPULATION_CSV, read_population_csv)
+
+
+def load_population_flags():
+    return load_compiled("population", POPULATION_CSV, read_population_csv, flags=True)
+
+
+def build_all():
+    for name, csv_path, reader in [("gdp_all_areas", GDP_CSV, read_gdp_csv),
+                                   ("population", POPULATION_CSV, read_population_csv)]:
+        write_compiled_table(name, csv_path, reader)
+        print(f"{csv_path.name} -> {get_compiled_path(name)}, {get_compiled_path(name + '-flags')}")
+
+
+if __name__ == "__main__":
+    build_all()
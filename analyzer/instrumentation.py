@@ -0,0 +1,186 @@
+# Timings and cache hit/miss counts of the dashboard hot paths
+# Every Streamlit rerun runs the script in its own thread, so the current rerun is kept per thread:
+# start_rerun() begins a new record, each hot path is wrapped in `with timed("name"):` and finish_rerun() closes the
+# record, adds it to the process wide totals and writes it as one json log line.
+#
+# Cache hits are counted per rerun: a memoized function (st.cache or lru_cache) is timed with cached=True and calls
+# record_miss("name") in its body, which only runs on a miss. The miss is kept with the rerun of the calling thread, so
+# another session filling the same cache at the same time does not turn this rerun's hit into a miss.
+#
+# The process wide totals can be scraped in the Prometheus text format from a local endpoint. Both outputs are off
+# unless configured through environment variables (or the .env file):
+#   DASHBOARD_METRICS_PORT - port of the metrics endpoint, e.g. 9464, served at http://localhost:<port>/metrics
+#   DASHBOARD_METRICS_LOG  - file the json log lines are appended to, "-" for stderr
+
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = threading.local()
+_totals_lock = threading.Lock()
+_totals = {"reruns": 0, "stages": {}}
+_setup_lock = threading.Lock()
+_setup_done = False
+
+
+def start_rerun():
+    _current.rerun = {"start": time.perf_counter(), "stages": [], "misses": set()}
+    return _current.rerun
+
+
+def get_current_rerun():
+    return getattr(_current, "rerun", None)
+
+
+def record_miss(name):
+    rerun = get_current_rerun()
+    if rerun is not None:
+        rerun["misses"].add(name)
+
+
+@contextmanager
+def timed(name, cached=False):
+    # cache is None for stages without a cache, otherwise "hit" or "miss"
+    rerun = get_current_rerun()
+    if rerun is not None:
+        rerun["misses"].discard(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if rerun is not None:
+            if cached:
+                cache = "miss" if name in rerun["misses"] else "hit"
+            else:
+                cache = None
+            rerun["stages"].append({"stage": name, "seconds": seconds, "cache": cache})
+
+
+def add_to_totals(stages):
+    with _totals_lock:
+        _totals["reruns"] += 1
+        for stage in stages.itertuples(index=False):
+            totals = _totals["stages"].setdefault(stage.stage, {
+                "count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS), "hits": 0, "misses": 0})
+            totals["count"] += 1
+            totals["sum"] += stage.seconds
+            for position, bound in enumerate(BUCKETS):
+                if stage.seconds <= bound:
+                    totals["buckets"][position] += 1
+            if stage.cache == "hit":
+                totals["hits"] += 1
+            elif stage.cache == "miss":
+                totals["misses"] += 1
+
+
+def finish_rerun():
+    # returns the stages of the rerun (stage, seconds, cache) with a total row
+    rerun = get_current_rerun()
+    if rerun is None:
+        return None
+    stages = pd.DataFrame(rerun["stages"], columns=["stage", "seconds", "cache"])
+    add_to_totals(stages)
+    total_seconds = time.perf_counter() - rerun["start"]
+
+    logger.info(json.dumps({
+        "event": "rerun",
+        "time": time.time(),
+        "total_seconds": round(total_seconds, 6),
+        "stages": [{"stage": stage.stage, "seconds": round(stage.seconds, 6), "cache": stage.cache}
+                   for stage in stages.itertuples(index=False)],
+    }))
+
+    _current.rerun = None
+    total = pd.DataFrame([{"stage": "total rerun", "seconds": total_seconds, "cache": None}])
+    return pd.concat([stages, total], ignore_index=True)
+
+
+def get_totals():
+    with _totals_lock:
+        return json.loads(json.dumps(_totals))
+
+
+def render_prometheus():
+    totals = get_totals()
+    lines = [
+        "# HELP dashboard_reruns_total Dashboard script reruns.",
+        "# TYPE dashboard_reruns_total counter",
+        f"dashboard_reruns_total {totals['reruns']}",
+        "# HELP dashboard_stage_seconds Wall time of the dashboard stages.",
+        "# TYPE dashboard_stage_seconds histogram",
+    ]
+    for stage, stage_totals in sorted(totals["stages"].items()):
+        label = stage.replace("\\", "\\\\").replace('"', '\\"')
+        for bound, count in zip(BUCKETS, stage_totals["buckets"]):
+            lines.append(f'dashboard_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+        lines.append(f'dashboard_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {stage_totals["count"]}')
+        lines.append(f'dashboard_stage_seconds_sum{{stage="{label}"}} {stage_totals["sum"]}')
+        lines.append(f'dashboard_stage_seconds_count{{stage="{label}"}} {stage_totals["count"]}')
+    for kind in ("hits", "misses"):
+        lines.append(f"# HELP dashboard_cache_{kind}_total Cache {kind} of the memoized dashboard stages.")
+        lines.append(f"# TYPE dashboard_cache_{kind}_total counter")
+        for stage, stage_totals in sorted(totals["stages"].items()):
+            label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'dashboard_cache_{kind}_total{{stage="{label}"}} {stage_totals[kind]}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="dashboard-metrics", daemon=True).start()
+    return server
+
+
+def setup_metrics():
+    # starts the configured outputs once per process, every rerun calls it
+    global _setup_done
+    with _setup_lock:
+        if _setup_done:
+            return
+        _setup_done = True
+
+        log_path = os.getenv("DASHBOARD_METRICS_LOG")
+        if log_path:
+            handler = logging.StreamHandler() if log_path == "-" else logging.FileHandler(log_path)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+        port = os.getenv("DASHBOARD_METRICS_PORT")
+        if port:
+            try:
+                start_metrics_server(int(port))
+            except OSError as error:
+                # e.g. another worker on this host already serves the port
+                logger.warning(f"metrics endpoint not started on port {port}: {error}")
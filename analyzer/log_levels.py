@@ -0,0 +1,20 @@
+# Growth over any window from precomputed log levels
+# Levels are turned into logs once, when a cube or table is built. The growth between any two periods is then a
+# lookup of the two log levels and one vectorized difference, instead of a divide over the sliced levels:
+#   growth = (level_end / level_start - 1) * 100 = expm1(log_end - log_start) * 100
+# Missing and non positive levels (BEA uses 0 for some suppressed values) have no log and become NaN.
+
+
+import numpy as np
+
+
+def to_log_levels(levels):
+    levels = np.asarray(levels, dtype="float64")
+    log_levels = np.full(levels.shape, np.nan)
+    np.log(levels, out=log_levels, where=levels > 0)
+    return log_levels
+
+
+def get_log_growth(log_start, log_end):
+    # percent growth between two log levels (arrays of the same shape)
+    return np.expm1(np.subtract(log_end, log_start)) * 100
@@ -1,53 +1,44 @@
-# Function to plot the GDP per capita for speficied industry for all target states for years 2016-2020
-# The input arguments : gdp_state_5year_filter - 5 year gdp data for the states
-#                       industry - name of industry to be anlyzed
+# Function to plot the GDP per capita for speficied industry for all target states for years 2016-2020 (or any other
+# window of years)
+# The input arguments : industry - name of industry to be anlyzed
+#                       states - target states
+#                       start_year, end_year - years of the charts and of the growth ranking
+#                       lazy - when True the section is collapsed in an expander, and its charts are only built once the
+#                              user ticks "Show charts" in it
+# The numbers are computed (and memoized) by analyzer.industry_analysis, this module only renders them.
+# Figures are cached per (industry, state set, window, data version), so opening a section again or in another session
+# costs nothing
 
 # The function returns a unstacked dataframe containing the per capita data for the specified industry, to be used for future analysis
 
 
-import os
-import requests
-import json
-import pandas as pd
-from dotenv import load_dotenv
-from pathlib import Path
-
-from bokeh.palettes import Oranges256 as oranges
-from bokeh.sampledata.us_states import data as us_states
-from bokeh.plotting import figure
-from bokeh.io import output_notebook, show
+from functools import lru_cache
 
 import streamlit as st
 import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-
 
-def plot_industry_analysis(gdp_state_5year_filter,population_by_state,industry):
-    gdp_generic_df = gdp_state_5year_filter.get_group(industry)
+from analyzer.industry_analysis import get_industry_version, industry_analysis
+from analyzer.instrumentation import record_miss, timed
 
-    gdp_generic_df = gdp_generic_df.set_index(['GeoName','Description'])
 
-    gdp_capita_generic = gdp_generic_df / population_by_state* 1000000
+# industries with a section of their own on the dashboard
+DASHBOARD_INDUSTRIES = ['All industry total',
+                        "  Agriculture, forestry, fishing and hunting",
+                        "   Health care and social assistance",
+                        "  Manufacturing",
+                        ' Private industries',
+                        '  Finance, insurance, real estate, rental, and leasing',
+                        '  Transportation and warehousing']
 
-    gdp_capita_generic = gdp_capita_generic.reset_index()
 
-    #melting the df arounf GeoName and Description
-    gdp_capita_generic = gdp_capita_generic.melt(['GeoName','Description'], var_name='Date', value_name='Value')
+@lru_cache(maxsize=128)
+def _get_industry_figures(industry, states, start_year, end_year, version):
+    record_miss(f"industry figures {industry.strip()}")
+    analysis = industry_analysis(industry, states, start_year, end_year)
+    text = analysis["years_text"]
+    gdp_capita_generic = analysis["gdp_capita"]
+    generic_growth_rank = analysis["growth_rank"]
 
-    # drop Description column and unstack
-    unstacked_gdp_capita_generic = gdp_capita_generic.drop(columns=["Description"]).set_index(['GeoName', 'Date']).unstack(level=0)
-
-    # find percent growths. if the 2020 value is not available, do not include it and return a relevant title.
-    if (unstacked_gdp_capita_generic["Value"].loc["2020"] == 0).sum() > 0:
-        generic_growth_rank = ((unstacked_gdp_capita_generic["Value"].loc["2019"]/unstacked_gdp_capita_generic["Value"].loc["2016"] - 1) * 100).sort_values()
-        text="2016 - 2019"
-    else:
-        generic_growth_rank = ((unstacked_gdp_capita_generic["Value"].loc["2020"]/unstacked_gdp_capita_generic["Value"].loc["2016"] - 1) * 100).sort_values()
-        text="2016 - 2020"
-
-
-    st.header(f"GDP Per Capita for {industry} for target states - {text}")
     generic_plot = px.bar(gdp_capita_generic, 
                             x='Date',
                             y='Value',
@@ -58,7 +49,6 @@ def plot_industry_analysis(gdp_state_5year_filter,population_by_state,industry):
                             height = 500,
                             labels = {'Date':"Fiscal Year", 'Value':'GDP per Capita'})
     generic_plot.update_layout()
-    st.plotly_chart(generic_plot)
 
 
 
@@ -71,6 +61,33 @@ def plot_industry_analysis(gdp_state_5year_filter,population_by_state,industry):
     generic_plot_2.update_layout(title_text = f"Percent Growth for {text} for: {industry}",
                                     showlegend = False)
 
-    st.plotly_chart(generic_plot_2)
+    return generic_plot, generic_plot_2
+
+
+def get_industry_figures(industry, states, start_year=2016, end_year=2020):
+    # the version of the GDP and population data is part of the key, a changed csv file gets new figures
+    return _get_industry_figures(industry, tuple(sorted(states)), int(start_year), int(end_year), get_industry_version())
+
+
+def show_industry_figures(industry, states, start_year, end_year):
+    with timed(f"industry figures {industry.strip()}", cached=True):
+        industry_figures = get_industry_figures(industry, states, start_year, end_year)
+    for industry_figure in industry_figures:
+        with timed(f"plotly_chart industry {industry.strip()}"):
+            st.plotly_chart(industry_figure)
+
+
+def plot_industry_analysis(industry, states, lazy=False, start_year=2016, end_year=2020):
+    with timed(f"industry analysis {industry.strip()}", cached=True):
+        analysis = industry_analysis(industry, states, start_year, end_year)
+    title = f"GDP Per Capita for {industry} for target states - {analysis['years_text']}"
+
+    if lazy:
+        with st.expander(title):
+            if st.checkbox("Show charts", key=f"show_industry_{industry}"):
+                show_industry_figures(industry, states, start_year, end_year)
+    else:
+        st.header(title)
+        show_industry_figures(industry, states, start_year, end_year)
 
-    return unstacked_gdp_capita_generic
\ No newline at end of file
+    return analysis["unstacked"]
@@ -0,0 +1,161 @@
+# Background refresh of the BEA data behind the dashboard
+# The data of the dashboard is published as one release: the income history, its aggregates and the shared income
+# dataset built from them (analyzer.dashboard_data). get_release hands every rerun the current release, a rerun reads
+# it once, so all its charts come from the same version.
+#
+# The first call in a process builds the first release (other sessions wait for it) and starts one worker thread.
+# The worker polls BEA on a schedule without going through the response cache:
+#   - GETDATASETLIST, the call the dashboard has always made on start up
+#   - the incremental refresh of the income history, which only asks for the latest years
+# A change in the dataset list or in the saved history (new or revised quarters) is a new release. The worker then
+# recomputes the aggregates, builds the shared dataset and warms the figure caches (the maps, whose titles name the
+# latest quarter, and the industry sections of the new target states), all off the request path, and only then swaps
+# the release with a single assignment. Sessions keep using the previous release until the swap and never wait for
+# a rebuild. A release is identified by the version of the history file it was built from, not by the quarters a poll
+# reports as changed: when a build fails after the history was saved, the next poll finds the same history but a
+# different version than the current release and builds it again.
+#
+# The schedule is set through an environment variable (or the .env file):
+#   DASHBOARD_REFRESH_INTERVAL - seconds between polls (default 3600), 0 turns the worker off
+# BEA_API_URL (analyzer.bea_cache) points the polls at a local stub server for testing.
+#
+# Run "python -m analyzer.refresh_worker" to poll once from the command line, e.g. to fill the caches before the
+# dashboard is started.
+
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from types import MappingProxyType
+
+from dotenv import load_dotenv
+
+from analyzer.bea_cache import bea_request
+from analyzer.bea_fetcher import PER_CAPITA_INCOME_QUERY
+from analyzer.dashboard_data import get_income_dataset, get_industry_dataset
+from analyzer.dashboard_figures import get_income_map_figure, get_target_states_figure
+from analyzer.income_history import (get_changed_periods, get_history_path, refresh_income_history,
+                                     update_income_aggregates)
+from analyzer.industry_analysis import get_industry_years
+from analyzer.instrumentation import record_miss
+from analyzer.plot_industry_analysis import DASHBOARD_INDUSTRIES, get_industry_figures
+from analyzer.shared_data import get_file_version
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60 * 60
+
+_release = None
+_release_lock = threading.Lock()
+_worker = None
+
+
+def get_refresh_interval():
+    return float(os.getenv("DASHBOARD_REFRESH_INTERVAL", DEFAULT_INTERVAL))
+
+
+def get_dataset_list_version(bea_api_key, refresh=False):
+    # hash of the GETDATASETLIST response, it changes when BEA changes the datasets it serves
+    bea_query = {"UserID": bea_api_key, "method": "GETDATASETLIST", "ResultFormat": "JSON"}
+    results = bea_request(bea_query, refresh=refresh)["BEAAPI"]["Results"]
+    return hashlib.sha1(json.dumps(results, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def warm_figures(income_dataset):
+    # figures every session starts with, at the default windows of the dashboard
+    first_quarter, latest_quarter = income_dataset["first_quarter"], income_dataset["latest_quarter"]
+    targets = income_dataset["emerging_markets"]["targets"]
+    get_income_map_figure(income_dataset["us_states"], latest_quarter)
+    get_target_states_figure(targets, first_quarter, latest_quarter)
+    for industry in DASHBOARD_INDUSTRIES:
+        get_industry_figures(industry, list(targets.index))
+
+
+def build_release(dataset_list_version, history_version, history, changed_periods, query=PER_CAPITA_INCOME_QUERY):
+    aggregates = update_income_aggregates(query, history, changed_periods)
+    income_dataset = get_income_dataset(history, aggregates, query)
+
+    # caches that do not depend on the BEA data, then the figures of the new data, so no session pays for them
+    get_industry_dataset()
+    get_industry_years()
+    warm_figures(income_dataset)
+
+    return MappingProxyType({
+        "dataset_list_version": dataset_list_version,
+        "history_version": history_version,
+        "latest_quarter": history["TimePeriod"].max(),
+        "changed_periods": tuple(changed_periods),
+        "published": time.time(),
+        "history": history,
+        "aggregates": aggregates,
+        "income_dataset": income_dataset,
+    })
+
+
+def poll(bea_api_key, refresh=True):
+    # publishes a new release when BEA has new data, returns True if it did
+    global _release
+    dataset_list_version = get_dataset_list_version(bea_api_key, refresh)
+    history, changed_periods = refresh_income_history(bea_api_key, PER_CAPITA_INCOME_QUERY, refresh=refresh)
+    history_version = get_file_version(get_history_path(PER_CAPITA_INCOME_QUERY, "history"))
+
+    current = _release
+    if current is not None:
+        if history_version == current["history_version"]:
+            if dataset_list_version == current["dataset_list_version"]:
+                return False
+        elif not changed_periods:
+            # the history was saved by a poll whose build failed, its quarters are new to the current release
+            changed_periods = get_changed_periods(history, current["history"])
+
+    release = build_release(dataset_list_version, history_version, history, changed_periods)
+    _release = release
+    return True
+
+
+def run_worker(bea_api_key, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            if poll(bea_api_key):
+                logger.info(f"new BEA data published, latest quarter {_release['latest_quarter']}")
+        except Exception:
+            logger.exception("BEA refresh failed, the current data stays in use")
+
+
+def start_worker(bea_api_key):
+    global _worker
+    interval = get_refresh_interval()
+    if _worker is None and interval > 0:
+        _worker = threading.Thread(target=run_worker, args=(bea_api_key, interval), name="bea-refresh", daemon=True)
+        _worker.start()
+
+
+def get_release(bea_api_key):
+    # the current release, built here (from the response cache when it is fresh) only by the first call of the process
+    release = _release
+    if release is not None:
+        return release
+
+    with _release_lock:
+        if _release is None:
+            record_miss("data release")
+            poll(bea_api_key, refresh=False)
+            start_worker(bea_api_key)
+    return _release
+
+
+def main():
+    load_dotenv()
+    start_time = time.perf_counter()
+    poll(os.getenv("BEA_API_KEY"))
+    print(f"latest quarter {_release['latest_quarter']}, new or revised quarters {list(_release['changed_periods'])} "
+          f"({time.perf_counter() - start_time:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
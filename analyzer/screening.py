@@ -0,0 +1,153 @@
+# Emerging markets screen, usable outside of Streamlit
+# Takes the bottom_n states by personal income in the latest quarter, ranks them by personal income growth from the
+# start quarter to the end quarter and keeps the top_k as target states. When an industry is given, the targets are
+# also ranked by their GDP per capita growth in that industry.
+#
+# The input arguments : personal_income - long dataframe with GeoName, TimePeriod ("2017Q1" or a date) and numeric DataValue
+#                       bottom_n, top_k - size of the low income pool and of the target set
+#                       start, end - quarters of the growth window, e.g. "2017Q1" and "2021Q2", by default the first
+#                                    and latest quarter of the data
+#                       industry - optional Description line of the GDP table
+#
+# screen_emerging_markets returns a dict with the growth of every state, the growth of the bottom_n states and the
+# targets (growth of the top_k states in ascending order). run_scenarios runs many screens on a process pool. The
+# quarters of every scenario are checked before the pool starts: a scenario with a quarter that is not in the data gets
+# one row with its error in the results instead of stopping the whole sweep.
+
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analyzer.industry_analysis import industry_analysis
+from analyzer.ingest import load_gdp, load_population
+
+
+LIST_OF_STATES = [ 'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut', 'Delaware', 'Florida', 'Georgia',
+                  'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky', 'Louisiana', 'Maine', 'Maryland', 'Massachusetts',
+                  'Michigan', 'Minnesota', 'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey', 
+                   'New Mexico', 'New York', 'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania', 'Rhode Island',
+                   'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah', 'Vermont', 'Virginia', 'Washington', 'West Virginia',
+                  'Wisconsin', 'Wyoming']
+
+# Alaska and Hawaii are not on the contiguous US map the dashboard screens from
+EXCLUDED_STATES = ("Alaska", "Hawaii")
+
+
+def get_income_by_quarter(personal_income):
+    # quarters as rows and states as columns, the US total, DC and regions are left out
+    personal_income = personal_income[personal_income["GeoName"].isin(LIST_OF_STATES)]
+    quarters = pd.to_datetime(personal_income["TimePeriod"].astype(str)).dt.to_period("Q")
+    return personal_income.assign(TimePeriod=quarters).pivot_table(index="TimePeriod", columns="GeoName",
+                                                                   values="DataValue", aggfunc="last")
+
+
+def screen_emerging_markets(personal_income, bottom_n=20, top_k=8, start=None, end=None, industry=None,
+                            excluded_states=EXCLUDED_STATES, income_by_quarter=None):
+    if income_by_quarter is None:
+        income_by_quarter = get_income_by_quarter(personal_income)
+    start = income_by_quarter.index[0] if start is None else start
+    end = income_by_quarter.index[-1] if end is None else end
+    income_by_quarter = income_by_quarter.drop(columns=list(excluded_states), errors="ignore")
+
+    # latest available income of every state
+    latest_income = income_by_quarter.ffill().iloc[-1]
+    lowest_states = latest_income.nsmallest(bottom_n).index
+
+    start_income = income_by_quarter.loc[pd.Period(start, freq="Q")]
+    end_income = income_by_quarter.loc[pd.Period(end, freq="Q")]
+    growth = ((end_income / start_income) - 1) * 100
+    growth.name = "DataValue"
+
+    #sort lowest to highest in rates of growth, and keep the top_k of the bottom_n states
+    bottom_growth = growth[lowest_states].sort_values()
+    targets = bottom_growth.iloc[-top_k:]
+
+    result = {"growth": growth, "bottom_growth": bottom_growth, "targets": targets, "industry_growth": None}
+    if industry is not None:
+        result["industry_growth"] = industry_analysis(industry, list(targets.index))["growth_rank"]
+    return result
+
+
+def get_scenarios(bottom_n, top_k, starts, ends, industries):
+    # every combination of the parameter lists
+    return [{"bottom_n": n, "top_k": k, "start": start, "end": end, "industry": industry}
+            for n, k, start, end, industry in itertools.product(bottom_n, top_k, starts, ends, industries)]
+
+
+def check_scenario(income_by_quarter, scenario):
+    # returns the scenario with its default quarters filled in and the error of its quarters (None when they are fine)
+    quarters = income_by_quarter.index
+    scenario = dict(scenario,
+                    start=str(quarters[0]) if scenario["start"] is None else scenario["start"],
+                    end=str(quarters[-1]) if scenario["end"] is None else scenario["end"])
+    try:
+        start, end = pd.Period(scenario["start"], freq="Q"), pd.Period(scenario["end"], freq="Q")
+    except ValueError as error:
+        return scenario, f"not a quarter: {error}"
+    missing = [str(quarter) for quarter in (start, end) if quarter not in quarters]
+    if missing:
+        return scenario, f"no data for {', '.join(missing)}, the data covers {quarters[0]} to {quarters[-1]}"
+    if start >= end:
+        return scenario, f"start {start} is not before end {end}"
+    return scenario, None
+
+
+# income table of the worker process, set once per worker so it is not pickled with every scenario
+_worker_income = None
+
+
+def _init_worker(income_by_quarter):
+    global _worker_income
+    _worker_income = income_by_quarter
+
+
+def _run_scenario(scenario_id, scenario, income_by_quarter=None):
+    if income_by_quarter is None:
+        income_by_quarter = _worker_income
+    result = screen_emerging_markets(None, income_by_quarter=income_by_quarter, **scenario)
+
+    # one row per target state, ranked from the highest growth
+    if result["industry_growth"] is not None:
+        ranking = result["industry_growth"].sort_values(ascending=False)
+    else:
+        ranking = result["targets"].sort_values(ascending=False)
+
+    rows = []
+    for rank, state in enumerate(ranking.index, start=1):
+        row = dict(scenario_id=scenario_id, **scenario)
+        row.update(rank=rank, GeoName=state, income_growth=result["targets"][state],
+                   industry_growth=None if result["industry_growth"] is None else result["industry_growth"][state])
+        rows.append(row)
+    return rows
+
+
+def run_scenarios(personal_income, scenarios, max_workers=None):
+    # runs every scenario on a process pool and returns the ranked target states of all of them in one dataframe
+    income_by_quarter = get_income_by_quarter(personal_income)
+
+    # the compiled tables of the industry rankings are (re)built here once, the workers only read them
+    if any(scenario["industry"] is not None for scenario in scenarios):
+        load_gdp()
+        load_population()
+
+    # scenarios with quarters outside the data are reported, only the others are screened
+    checked = [check_scenario(income_by_quarter, scenario) for scenario in scenarios]
+    results = [[dict(scenario_id=scenario_id, **scenario, error=error)]
+               for scenario_id, (scenario, error) in enumerate(checked) if error is not None]
+    scenario_ids = [scenario_id for scenario_id, (_, error) in enumerate(checked) if error is None]
+    valid = [checked[scenario_id][0] for scenario_id in scenario_ids]
+
+    if max_workers == 1:
+        results += [_run_scenario(scenario_id, scenario, income_by_quarter)
+                    for scenario_id, scenario in zip(scenario_ids, valid)]
+    elif valid:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(income_by_quarter,)) as executor:
+            results += list(executor.map(_run_scenario, scenario_ids, valid, chunksize=max(1, len(valid) // 64)))
+
+    results = pd.DataFrame([row for rows in results for row in rows])
+    if not results.empty:
+        results = results.sort_values(["scenario_id"], kind="stable").reset_index(drop=True)
+    return results
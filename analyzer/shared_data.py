@@ -0,0 +1,105 @@
+# Process wide, read only datasets shared by every Streamlit session
+# get_shared builds a dataset once per data version and hands the same objects to every session, so a new session does
+# not copy any frame. Other sessions asking for a dataset while it is built wait for that build instead of starting
+# their own, and a new version replaces the old one once it is built. Datasets that sessions ask for in several
+# versions at once (e.g. one per window) keep the max_versions most recently used ones instead.
+#
+# Datasets are frozen when they are stored: the numpy arrays behind every frame, series and array are marked read
+# only, so a write to existing cells from a session (frame.iloc[0, 0] = ..., series[i] = ..., frame.loc[:, c] = ...,
+# values[i] = ...) raises "assignment destination is read-only" instead of changing the data of every other session.
+# The frames themselves are not locked: replacing or adding a whole column (frame[c] = ..., frame.insert, methods with
+# inplace=True such as fillna) still succeeds and is seen by every session, so sessions must never do that on a shared
+# frame. Derived frames (filters, assign, sort_values, melt, copy, ...) are new objects and can be modified freely.
+#
+# The input arguments : name - name of the dataset, also used for its cache hit/miss timing
+#                       version - anything hashable that changes with the data, e.g. get_file_version(source files)
+#                       builder, args - builder(*args) returns the dataset, a dict (or tuple) of frames, series,
+#                                       arrays and plain values
+#                       max_versions - number of versions kept, least recently used first out (default 1)
+
+
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from analyzer.instrumentation import record_miss
+
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+_build_locks = {}
+
+
+def freeze_array(values):
+    values.flags.writeable = False
+    return values
+
+
+def freeze_values(values):
+    # numpy backed columns are wrapped without copying, extension arrays (e.g. categoricals) are kept as they are
+    if isinstance(values.dtype, np.dtype):
+        return freeze_array(values.to_numpy())
+    return values.array
+
+
+def freeze(dataset):
+    if isinstance(dataset, pd.DataFrame):
+        return pd.DataFrame({column: freeze_values(dataset[column]) for column in dataset.columns},
+                            index=dataset.index, columns=dataset.columns, copy=False)
+    if isinstance(dataset, pd.Series):
+        return pd.Series(freeze_values(dataset), index=dataset.index, name=dataset.name, copy=False)
+    if isinstance(dataset, np.ndarray):
+        return freeze_array(dataset)
+    if isinstance(dataset, dict):
+        return MappingProxyType({key: freeze(value) for key, value in dataset.items()})
+    if isinstance(dataset, tuple):
+        return tuple(freeze(value) for value in dataset)
+    return dataset
+
+
+def get_file_version(*paths):
+    # modification times of the files a dataset is built from, missing files count as version None
+    return tuple((str(path), path.stat().st_mtime_ns if path.exists() else None) for path in paths)
+
+
+def get_stored(name, version):
+    versions = _datasets.get(name)
+    if versions is None or version not in versions:
+        return None
+    versions.move_to_end(version)
+    return versions[version]
+
+
+def get_shared(name, version, builder, *args, max_versions=1):
+    with _datasets_lock:
+        dataset = get_stored(name, version)
+        if dataset is not None:
+            return dataset
+        build_lock = _build_locks.setdefault(name, threading.Lock())
+
+    with build_lock:
+        # another session may have built this version while this one was waiting
+        with _datasets_lock:
+            dataset = get_stored(name, version)
+        if dataset is not None:
+            return dataset
+
+        record_miss(name)
+        dataset = freeze(builder(*args))
+        with _datasets_lock:
+            versions = _datasets.setdefault(name, OrderedDict())
+            versions[version] = dataset
+            while len(versions) > max_versions:
+                versions.popitem(last=False)
+    return dataset
+
+
+def clear_shared(name=None):
+    with _datasets_lock:
+        if name is None:
+            _datasets.clear()
+        else:
+            _datasets.pop(name, None)
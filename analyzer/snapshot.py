@@ -0,0 +1,173 @@
+# Static snapshot of the dashboard
+# Builds every figure of the dashboard once and writes it to static files, so a report can be served by any plain file
+# server without running Streamlit or computing anything per reader:
+#   figures/<name>.json - Plotly figure json, can be loaded with Plotly.newPlot or plotly.io.read_json
+#   figures/<name>.html - standalone page of the figure, all pages share figures/plotly.min.js
+#   data.json.gz        - the frames behind the figures, gzipped json with one "split" oriented table per frame
+#   manifest.json       - data version, window and list of the figures with their section and title
+#   index.html          - links to every figure page by section
+#
+# The input arguments : income_dataset - dict of frames built by analyzer.dashboard_data.build_income_dataset
+#                       industries - Description lines of the GDP table to export the industry analysis for
+#                       output_dir - folder the snapshot is written to
+#                       formats - "html" and/or "json"
+#                       start_year, end_year - window of the industry analysis
+#                       max_workers - processes building and writing the industry figures, one per cpu when None
+
+
+import re
+import gzip
+import html
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+from analyzer.dashboard_data import get_income_growth
+from analyzer.dashboard_figures import (get_annual_income_figure, get_quarterly_income_figure, get_income_map_figure,
+                                        get_income_growth_figure, get_income_with_growth_figure,
+                                        get_low_income_growth_figure, get_target_states_figure)
+from analyzer.industry_analysis import industry_analysis, get_industry_growth
+from analyzer.ingest import load_gdp, load_population
+from analyzer.plot_industry_analysis import get_industry_figures
+
+
+def get_slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).strip().lower()).strip("-")
+
+
+def get_income_figures(income_dataset):
+    # (name, section, figure) of the personal income charts, the annual chart once for every selectable year
+    annual = income_dataset["annual"]
+    for time_period in annual.index.unique():
+        yield f"annual-income-{time_period.year}", "Annual Personal Income", get_annual_income_figure(annual, time_period)
+
+    yield "quarterly-income", "Personal Income by Quarter", get_quarterly_income_figure(income_dataset["quarterly_wide"])
+    first_quarter, latest_quarter = income_dataset["first_quarter"], income_dataset["latest_quarter"]
+    yield "income-map", "Personal Income by Quarter", get_income_map_figure(income_dataset["us_states"], latest_quarter)
+
+    # the default growth window of the dashboard
+    growth = get_income_growth(income_dataset, first_quarter, latest_quarter)
+    yield "income-growth", "Personal Income Growth", get_income_growth_figure(growth, first_quarter, latest_quarter,
+                                                                               len(annual))
+    yield "income-with-growth", "Personal Income Growth", get_income_with_growth_figure(
+        income_dataset["income_vs_growth"], first_quarter, latest_quarter)
+
+    emerging_markets = income_dataset["emerging_markets"]
+    yield "low-income-growth", "Target States", get_low_income_growth_figure(emerging_markets["bottom_growth"],
+                                                                             first_quarter, latest_quarter)
+    yield "target-states", "Target States", get_target_states_figure(emerging_markets["targets"], first_quarter,
+                                                                     latest_quarter)
+
+
+def get_industry_snapshot_figures(industry, states, start_year, end_year):
+    gdp_per_capita_figure, growth_figure = get_industry_figures(industry, states, start_year, end_year)
+    yield f"industry-{get_slug(industry)}-gdp-per-capita", "Industries", gdp_per_capita_figure
+    yield f"industry-{get_slug(industry)}-growth", "Industries", growth_figure
+
+
+def get_quarterly_table(income_dataset):
+    # personal income of every state and quarter in long format (GeoName, TimePeriod as the first day, DataValue)
+    quarterly = income_dataset["quarterly_wide"].unstack().rename("DataValue")
+    quarterly = quarterly.rename_axis(["GeoName", "TimePeriod"]).reset_index()
+    return quarterly.assign(TimePeriod=quarterly["TimePeriod"].dt.strftime("%Y-%m-%d"))
+
+
+def get_data_bundle(income_dataset, industries, states, start_year, end_year):
+    emerging_markets = income_dataset["emerging_markets"]
+    industry_growth, _ = get_industry_growth(tuple(sorted(states)), start_year, end_year)
+    industry_gdp_per_capita = pd.concat([industry_analysis(industry, states, start_year, end_year)["gdp_capita"]
+                                         for industry in industries], ignore_index=True)
+    return {
+        "annual": income_dataset["annual"].reset_index().astype({"TimePeriod": str}),
+        "quarterly": get_quarterly_table(income_dataset),
+        "growth": income_dataset["growth"].rename(columns={0: "DataValue"}),
+        "income_vs_growth": income_dataset["income_vs_growth"],
+        "bottom_growth": emerging_markets["bottom_growth"].reset_index(),
+        "targets": emerging_markets["targets"].reset_index(),
+        "industry_growth": industry_growth.loc[list(industries)].rename_axis("Description").reset_index(),
+        "industry_gdp_per_capita": industry_gdp_per_capita,
+    }
+
+
+def write_data_bundle(data_bundle, bundle_path):
+    tables = {name: json.loads(frame.to_json(orient="split", index=False)) for name, frame in data_bundle.items()}
+    with gzip.open(bundle_path, "wt", encoding="utf-8") as f:
+        json.dump(tables, f, separators=(",", ":"))
+
+
+def write_figures(figures, figure_dir, formats):
+    # writes (name, section, figure) tuples and returns their manifest entries
+    entries = []
+    for name, section, figure in figures:
+        if "json" in formats:
+            figure.write_json(str(figure_dir / f"{name}.json"))
+        if "html" in formats:
+            # the pages load figures/plotly.min.js, written once for the whole snapshot
+            figure.write_html(str(figure_dir / f"{name}.html"), include_plotlyjs="directory", full_html=True)
+        entries.append({"name": name, "section": section, "title": (figure.layout.title.text or name).strip()})
+    return entries
+
+
+def _write_industry_figures(industry, states, start_year, end_year, figure_dir, formats):
+    # runs in a worker process, building the faceted industry charts is the slow part of the export
+    return write_figures(get_industry_snapshot_figures(industry, states, start_year, end_year), figure_dir, formats)
+
+
+def write_index(index_path, figures, formats, generated):
+    sections = {}
+    for entry in figures:
+        sections.setdefault(entry["section"], []).append(entry)
+
+    extension = "html" if "html" in formats else "json"
+    lines = ["<!DOCTYPE html>", "<html>", "<head><meta charset=\"utf-8\">",
+             "<title>Identifying Emerging markets in the US</title></head>", "<body>",
+             "<h1>Identifying Emerging markets in the US</h1>", f"<p>Snapshot of {html.escape(generated)}</p>"]
+    for section, entries in sections.items():
+        lines.append(f"<h2>{html.escape(section)}</h2>")
+        lines.append("<ul>")
+        for entry in entries:
+            lines.append(f"<li><a href=\"figures/{entry['name']}.{extension}\">{html.escape(entry['title'])}</a></li>")
+        lines.append("</ul>")
+    lines += ["</body>", "</html>"]
+    index_path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def export_snapshot(income_dataset, industries, output_dir, formats=("html", "json"), start_year=2016, end_year=2020,
+                    max_workers=None):
+    output_dir = Path(output_dir)
+    figure_dir = output_dir / "figures"
+    figure_dir.mkdir(parents=True, exist_ok=True)
+    if "html" in formats:
+        (figure_dir / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+
+    states = list(income_dataset["emerging_markets"]["targets"].index)
+    figures = write_figures(get_income_figures(income_dataset), figure_dir, formats)
+
+    # the compiled tables are (re)built here once, the workers only read them
+    load_gdp()
+    load_population()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_write_industry_figures, industry, states, start_year, end_year, figure_dir, formats)
+                   for industry in industries]
+        for future in futures:
+            figures.extend(future.result())
+
+    write_data_bundle(get_data_bundle(income_dataset, industries, states, start_year, end_year),
+                      output_dir / "data.json.gz")
+
+    generated = time.strftime("%Y-%m-%d %H:%M:%S")
+    manifest = {
+        "generated": generated,
+        "latest_quarter": income_dataset["log_income"].index[-1],
+        "target_states": states,
+        "industry_years": [int(start_year), int(end_year)],
+        "figures": figures,
+    }
+    with open(output_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    write_index(output_dir / "index.html", figures, formats, generated)
+    return manifest
@@ -0,0 +1,67 @@
+# State lookup and choropleth templates for the US maps
+# get_state_lookup returns a dataframe of the 50 states and DC with their FIPS and postal codes, indexed by GeoName and
+# built once per process from Resources/geofips.csv. The postal codes are attached by FIPS code, so the lookup can not
+# go out of order with the data the way a list of codes sorted by name can.
+#
+# get_choropleth returns a US choropleth built from a cached template, only the locations, values and hover text
+# change between reruns.
+
+
+from functools import lru_cache
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from analyzer.ingest import RESOURCES
+
+
+GEOFIPS_CSV = RESOURCES / "geofips.csv"
+
+# USPS codes of the states and DC by FIPS code
+POSTAL_CODES = {
+    "01": "AL", "02": "AK", "04": "AZ", "05": "AR", "06": "CA", "08": "CO", "09": "CT", "10": "DE", "11": "DC",
+    "12": "FL", "13": "GA", "15": "HI", "16": "ID", "17": "IL", "18": "IN", "19": "IA", "20": "KS", "21": "KY",
+    "22": "LA", "23": "ME", "24": "MD", "25": "MA", "26": "MI", "27": "MN", "28": "MS", "29": "MO", "30": "MT",
+    "31": "NE", "32": "NV", "33": "NH", "34": "NJ", "35": "NM", "36": "NY", "37": "NC", "38": "ND", "39": "OH",
+    "40": "OK", "41": "OR", "42": "PA", "44": "RI", "45": "SC", "46": "SD", "47": "TN", "48": "TX", "49": "UT",
+    "50": "VT", "51": "VA", "53": "WA", "54": "WV", "55": "WI", "56": "WY",
+}
+
+
+@lru_cache(maxsize=1)
+def get_state_lookup():
+    # the census file has a few lines of title before the header row, regions and divisions have FIPS code 00
+    geofips = pd.read_csv(GEOFIPS_CSV, skiprows=6, header=None, usecols=[1, 2, 3, 4], dtype=str,
+                          names=["Region", "Division", "fips", "GeoName"])
+    states = geofips[geofips["fips"] != "00"].copy()
+    states["code"] = states["fips"].map(POSTAL_CODES)
+    return states.sort_values("GeoName").set_index("GeoName")[["fips", "code", "Region", "Division"]]
+
+
+def get_state_codes(states):
+    # postal codes of the given state names, in the same order
+    return list(get_state_lookup().loc[list(states), "code"])
+
+
+@lru_cache(maxsize=16)
+def get_choropleth_template(colorscale, colorbar_title, title_text, height=800):
+    template = go.Figure(data=go.Choropleth(
+        locationmode = 'USA-states', # set of locations match entries in `locations`
+        colorscale = colorscale,
+        colorbar_title = colorbar_title,
+        autocolorscale=False,
+        marker_line_color='white'# line markers between states
+    ))
+    template.update_layout(
+        geo_scope='usa', # limite map scope to USA,
+        title_text = title_text,
+        height = height
+    )
+    return template
+
+
+def get_choropleth(locations, z, colorscale, colorbar_title, title_text, text=None, height=800):
+    # copy of the cached template with this rerun's data, the template itself is never modified
+    choropleth = go.Figure(get_choropleth_template(colorscale, colorbar_title, title_text, height))
+    choropleth.update_traces(locations=locations, z=z, text=text)
+    return choropleth
@@ -8,27 +8,30 @@
 
 #import required libraries
 
+# only what the dashboard uses is imported, every module here adds to the start up of a new worker
+# (python -m benchmarks.import_budget checks it)
 import os
-import requests
-import json
-import pandas as pd
 from dotenv import load_dotenv
-from pathlib import Path
-
-from bokeh.palettes import Oranges256 as oranges
-from bokeh.sampledata.us_states import data as us_states
-from bokeh.plotting import figure
-from bokeh.io import output_notebook, show
 
 import streamlit as st
 import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from analyzer.plot_industry_analysis import plot_industry_analysis
+from analyzer.industry_analysis import get_industry_years
+from analyzer.dashboard_figures import (get_annual_income_figure, get_quarterly_income_figure, get_income_map_figure,
+                                        get_income_growth_figure, get_income_with_growth_figure,
+                                        get_low_income_growth_figure, get_target_states_figure,
+                                        get_composite_ranking_figure)
+from analyzer.geo_pipeline import load_geo_level, screen_geographies
+from analyzer.dashboard_data import get_income_growth, get_industry_dataset, get_composite_ranking
+from analyzer.composite_ranking import get_weights, get_scores, update_scores, get_top_k
+from analyzer.refresh_worker import get_release
+from analyzer.instrumentation import start_rerun, finish_rerun, record_miss, setup_metrics, timed
 
 st.set_page_config(
     layout="wide",
 )
+# timings and cache hits of this rerun, shown in the sidebar and exported as logs and metrics
+start_rerun()
 st.title("Identifying Emerging markets in the US")
 
 @st.cache
@@ -45,63 +48,28 @@ def get_api_key():
     bea_api_key=os.getenv("BEA_API_KEY")
     return bea_api_key
 
-@st.cache
-def get_Data_List(bea_api_key):
-    # set up query URL
-    bea_url = "http://apps.bea.gov/api/data?UserID=" + bea_api_key + "&method=GETDATASETLIST&ResultFormat=JSON" 
-
-    #send request to BEA
-    bea_response = requests.get(bea_url).json()["BEAAPI"]["Results"]
-    return bea_response
-
-@st.cache
-def get_Data(bea_api_key):
-    # this query will get the data for all states for the last five years for personal income per capita.
-    bea_states_personal_income_linecode_query_url = "http://apps.bea.gov/api/data?UserID=" + bea_api_key + "&method=GetData&datasetname=Regional&TableName=SQINC1&GeoFIPS=STATE&LineCode=3&Year=LAST5&ResultFormat=JSON"
-
-    #query for last five years personal income by state.
-    personal_income_by_state_5year = pd.DataFrame(requests.get(bea_states_personal_income_linecode_query_url).json()["BEAAPI"]["Results"]["Data"])
-    return personal_income_by_state_5year
+@st.cache(allow_output_mutation = True)
+def get_Geo_Data(bea_api_key, geo_level):
+    # per capita personal income for every county or metro area, in long format keyed by FIPS code
+    record_miss("get_Geo_Data")
+    return load_geo_level(bea_api_key, geo_level)
 
 
 # Read the API KEY
 bea_api_key = get_api_key()
+setup_metrics()
 
-# get data list from bea 
-bea_response = get_Data_List(bea_api_key)
-
-# get the regional table dataframe
-personal_income_by_state_5year = get_Data(bea_api_key)
-
-# clip out the unnecessary columns
-personal_income_by_state_5year=personal_income_by_state_5year[["GeoName", "TimePeriod", "DataValue"]]
-
-# Used str.replace() to remove the ',' from the Income datavalue and convert to float from string
-personal_income_by_state_5year['DataValue'] = personal_income_by_state_5year['DataValue'].str.replace(',', '').astype('float')
-
-# Filter the dataframe to get just the states
-
-list_of_states = [ 'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut', 'Delaware', 'Florida', 'Georgia',
-                  'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky', 'Louisiana', 'Maine', 'Maryland', 'Massachusetts',
-                  'Michigan', 'Minnesota', 'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey', 
-                   'New Mexico', 'New York', 'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania', 'Rhode Island',
-                   'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah', 'Vermont', 'Virginia', 'Washington', 'West Virginia',
-                  'Wisconsin', 'Wyoming']
-
-personal_income_state_filter = personal_income_by_state_5year['GeoName'].isin(list_of_states)
-personal_income_filter_by_state = personal_income_by_state_5year[personal_income_state_filter]
+# the current release of the BEA data: the data list and personal income per capita for all states, only the
+# quarters missing from the local history are downloaded. the frames behind the charts (last five years of the states,
+# annual means, long format, growth, target states) are built once per release and shared read only by every session.
+# a background worker checks BEA for new data and switches the sessions to a new release once it is fully built
+with timed("data release", cached = True):
+    release = get_release(bea_api_key)
+income_dataset = release['income_dataset']
 
-# Setting the time period to be the index and converting the datatype from string to dateTime
-personal_income_filter_by_state_2 = personal_income_filter_by_state
-personal_income_filter_by_state = personal_income_filter_by_state.set_index('TimePeriod')
-personal_income_filter_by_state.index = pd.to_datetime(personal_income_filter_by_state.index)
-
-# Group the data by state and calculate the average personal income for every year from 2017 to current year
-
-personal_income_filter_annual = personal_income_filter_by_state.groupby('GeoName').resample('A').mean()
-personal_income_filter_annual = personal_income_filter_annual.reset_index()
-personal_income_filter_annual['TimePeriod'] = personal_income_filter_annual['TimePeriod'].dt.date
-personal_income_filter_annual = personal_income_filter_annual.set_index('TimePeriod')
+personal_income_filter_annual = income_dataset['annual']
+# first and latest quarter of the five years shown, the window moves on as BEA publishes new quarters
+first_quarter, latest_quarter = income_dataset['first_quarter'], income_dataset['latest_quarter']
 
 
 st.header(" Annual Personal Income ranked in ascending order")
@@ -109,295 +77,205 @@ st.header(" Annual Personal Income ranked in ascending order")
 # SelectBox for selecting the timeperiod to view the percapita Personal Income
 time = st.selectbox("Choose a Time Period:", personal_income_filter_annual.index.unique())
 
-# Generating plotly express graphs based on the user selected year
-fig = px.bar(personal_income_filter_annual.loc[time].sort_values('DataValue'),
-             x = 'GeoName',
-             y = 'DataValue' ,
-             width = 1000,
-             title = f'Annual Personal Income for all states in ascending order -{time}',
-             labels = { 'GeoName': 'State', 'DataValue': 'Personal Income($)'}, # Axis labels to be displayed on the chart and while hovering
-             color_discrete_sequence = ['pink']*len(personal_income_filter_annual)) 
-
-# Extracting the data to display the limiting line
-df = personal_income_filter_annual.loc[time].sort_values('DataValue') 
-
-# Adding the line onto the plot
-fig.add_shape(type = 'line',
-                x0 = df['GeoName'][20], # Place the line at the 21st element to seperate the last 20 states
-                y0 = -5000,
-                x1 = df['GeoName'][20],
-                y1 = max(df['DataValue']),
-                line = dict(color = 'Red', width = 3, dash = 'dashdot'))
-st.plotly_chart(fig)
+# Generating plotly express graphs based on the user selected year, with a line seperating the 20 states with the
+# lowest personal income
+fig = get_annual_income_figure(personal_income_filter_annual, time)
+with timed("plotly_chart annual income"):
+    st.plotly_chart(fig)
 
 #Plots for data pivoted by states
 
-st.header("Personal Income for Fiscal Quarters from 2017 Q1 - 2021 Q2")
-# Convert TimePeriod to datetime to get results in a sorted time manner
-personal_income_filter_by_state_2['TimePeriod'] = pd.to_datetime(personal_income_filter_by_state_2['TimePeriod']).dt.date
-
-# Pivoting the dataframe around GeoName and TimePeriod
-personal_income_melt = personal_income_filter_by_state_2.melt(id_vars = ['GeoName', 'TimePeriod'])
-
-# Line plot for percapita personal income for all the states for all the fiscal quarters. 
-layout_plots_line = px.line(personal_income_melt, 
-                        x='TimePeriod',
-                        y='value',
-                        color = 'GeoName',
-                        width = 1000,
-                        height = 800,
-                        labels = { 'TimePeriod': 'Fiscal Quarter', 'value': 'Personal Income($)', 'GeoName':'State'},
-                        title = "5 year Personal Income for all states")
-                     
-                        
-st.plotly_chart(layout_plots_line)
-
-#Sort the States by Personal Income
-personal_income_sorted = personal_income_filter_by_state_2.sort_values(by = 'DataValue')
-
-#Pivoting the table around Geoname and Timeperiod
-personal_income_melt_2 = personal_income_sorted.melt(id_vars = ['GeoName', 'TimePeriod'])
-
-st.header('US Map with Personal Income for Q2 of 2021')
-
-# Dataframe grouped by state and extracted the last element from each group which is the personal income value for 2021Q2
-
-personal_income_2021Q4 = personal_income_sorted.sort_values('TimePeriod').groupby('GeoName').last()
-
-# loading US states boundary data which is available in bokeh as a part of bokeh.sampledata.us_states
-us_states_df = pd.DataFrame(us_states).T
-
+st.header(f"Personal Income for Fiscal Quarters from {first_quarter[:4]} {first_quarter[-2:]} - {latest_quarter[:4]} {latest_quarter[-2:]}")
+# quarters as rows and states as columns, from the shared dataset
+personal_income_by_quarter = income_dataset['quarterly_wide']
 
-# reset index for merging
-personal_income_2021Q4 = personal_income_2021Q4.reset_index()
+# Slider to zoom into a window of quarters, the chart keeps at most a few hundred points per state so the window
+# shows more detail the smaller it is, and the data sent to the browser stays bounded
+line_quarters = list(personal_income_by_quarter.index)
+line_start, line_end = st.select_slider("Zoom to the quarters:",
+                                        options = line_quarters,
+                                        value = (line_quarters[0], line_quarters[-1]),
+                                        format_func = lambda quarter: f"{quarter.year}Q{quarter.quarter}")
 
-# deleting states of Alaska, Hawaii and District of Columbia
-us_states_df = us_states_df[~us_states_df["name"].isin(['Alaska', "Hawaii", "District of Columbia"])]
+# Line plot for percapita personal income for all the states for all the fiscal quarters.
+layout_plots_line = get_quarterly_income_figure(personal_income_by_quarter.loc[line_start:line_end])
 
-# Merge the two dataframes
-us_states_df = us_states_df.merge(personal_income_2021Q4[["GeoName", "DataValue"]], how="left", left_on="name", right_on="GeoName")
+with timed("plotly_chart quarterly income"):
+    st.plotly_chart(layout_plots_line)
 
-# Sort the resulting dataframe by geoname to add the state codes for generating the choropleth graph
-us_states_df = us_states_df.sort_values('GeoName')
+st.header(f'US Map with Personal Income for {latest_quarter[-2:]} of {latest_quarter[:4]}')
 
-# Add the state code column to the dataframe
-us_states_df['code'] = ['AL','AZ','AR','CA','CO','CT','DE','FL','GA','ID',
-                        'IL','IN','IA','KS','KY','LA','ME','MD','MA','MI',
-                        'MN','MS','MO','MT','NE','NV','NH','NJ','NM','NY',
-                        'NC','ND','OH','OK','OR','PA','RI','SC','SD','TN',
-                        'TX','UT','VT','VA','WA','WV','WI','WY']
+# contiguous states with their postal codes, the personal income of the latest quarter and the hover text
+us_states_df = income_dataset['us_states']
 
-# Hover text
-us_states_df['text'] = us_states_df["GeoName"] + '<br>' + 'Per Capita PI = $' + us_states_df['DataValue'].astype(str)
+# Generate the choropleth map from the cached template, only the values and hover text change between reruns
+fig1 = get_income_map_figure(us_states_df, latest_quarter)
 
-# Generate the choropleth map
-fig1 = go.Figure(data=go.Choropleth(
-    locations=us_states_df['code'], # Spatial coordinates
-    z = us_states_df['DataValue'], # Data to be color-coded
-    locationmode = 'USA-states', # set of locations match entries in `locations`
-    colorscale = 'blackbody' ,
-    colorbar_title = "USD",
-    autocolorscale=False,
-    text=us_states_df['text'], # hover text
-    marker_line_color='white'# line markers between states
-    
-  
-))
+with timed("plotly_chart income map"):
+    st.plotly_chart(fig1, use_container_width = True)
 
-fig1.update_layout(
-        geo_scope='usa', # limite map scope to USA,
-        title_text = " Map of US with Personal Income in Q2 of 2021",
-         height = 800
-         )#margin={"r":0,"t":0,"l":0,"b":0}
 
-st.plotly_chart(fig1, use_container_width = True)
+st.header(f"Percent growth personal income {first_quarter} to {latest_quarter}")
 
+# the increase in personal income per state over the chosen quarters (first to latest quarter by default), sorted in
+# ascending order. the growth of any window is a difference of the precomputed log incomes
+income_quarters = list(income_dataset['log_income'].index)
+growth_start, growth_end = st.select_slider("Choose the quarters of the growth window:",
+                                            options = income_quarters,
+                                            value = (first_quarter, latest_quarter))
+personal_income_growth_2017to2021Q2_temp = get_income_growth(income_dataset, growth_start, growth_end)
 
-#begin process to filter states to focus analysis on. filter bottom 20 by personal income in 2020Q4.
-lowest_20_states_df = us_states_df.nsmallest(20, "DataValue")
-
-# unstack dataframe 
-personal_income_filter_by_state = personal_income_filter_by_state.reset_index()
-unstacked_personal_income_by_state = personal_income_filter_by_state.set_index(['GeoName', 'TimePeriod']).unstack(level=0)
-
-# make new dataframe with the increase in personal income per state for this time period
-
-personal_income_growth_2017to2021Q2 = ((unstacked_personal_income_by_state.transpose()["2021-04-01"] / unstacked_personal_income_by_state.transpose()["2017-01-01"]) - 1) * 100
-personal_income_growth_2017to2021Q2_temp = personal_income_growth_2017to2021Q2.reset_index().sort_values(by = 0)
-
-st.header("Percent growth personal income 2017Q1 to 2021Q2")
-
-fig2 = px.bar(personal_income_growth_2017to2021Q2_temp,
-              x = 'GeoName',
-              y = 0,
-             width = 1000,
-             title = "Percent growth personal income 2017Q1 to 2021Q2 sorted in ascending order",
-             labels = { 'GeoName': 'State', '0' : 'Percent Personal Income Growth(%)'}, # Axis labels to be displayed on the chart and while hovering
-             color_discrete_sequence = ['pink']*len(personal_income_filter_annual)) 
-
-personal_income_growth_2017to2021Q2_temp = personal_income_growth_2017to2021Q2_temp.reset_index(drop = True)
-# Adding the line onto the plot
-fig2.add_shape(type = 'line',
-                x0 = personal_income_growth_2017to2021Q2_temp['GeoName'][20], # Place the line at the 21st element to seperate the last 20 states
-                y0 = -2,
-                x1 = personal_income_growth_2017to2021Q2_temp['GeoName'][20],
-                y1 = 30,
-                line = dict(color = 'Red', width = 3, dash = 'dashdot'))
-st.plotly_chart(fig2)
+fig2 = get_income_growth_figure(personal_income_growth_2017to2021Q2_temp, growth_start, growth_end, len(personal_income_filter_annual))
+with timed("plotly_chart income growth"):
+    st.plotly_chart(fig2)
 
 
 st.header(" Personal Income with Percent Growth")
 
-# Creating a new Dataframe to plot the two metrics
-personal_income_vs_percentage_growth = pd.DataFrame()
-personal_income_vs_percentage_growth['GeoName'] = personal_income_growth_2017to2021Q2_temp['GeoName']
-personal_income_vs_percentage_growth['Percent_Growth'] = personal_income_growth_2017to2021Q2_temp[0]
-personal_income_vs_percentage_growth = personal_income_vs_percentage_growth.merge(us_states_df[['GeoName', 'DataValue']], how = 'inner', on = 'GeoName')
-personal_income_vs_percentage_growth = personal_income_vs_percentage_growth.sort_values(by = 'DataValue')
-
-# Define a subplot figure to plot both the graphs together
-sub_fig = make_subplots(specs = [[{"secondary_y": True}]])
-
-# First generate the line figure for percentage growth
-fig3 = px.line(x = personal_income_vs_percentage_growth['GeoName'],
-               y = personal_income_vs_percentage_growth['Percent_Growth'],
-               color_discrete_sequence = ['red']*len(personal_income_vs_percentage_growth)                    
-               )
-
-# Define a figure for plotting the bar graph for Per Capita Personal Income
-fig4 = px.bar(x = personal_income_vs_percentage_growth['GeoName'],
-              y = personal_income_vs_percentage_growth['DataValue'] ,
-              color_discrete_sequence = ['pink']*len(personal_income_vs_percentage_growth),
-              width = 1000
-            ) 
-
-# Define second axis for percent growth and define mode to plot markers alongwith the line graph
-fig3.update_traces(yaxis = "y2",mode='markers+lines')
-
-# Add both the figures on the sub plot figure
-sub_fig.add_traces(fig4.data + fig3.data)
-sub_fig.update_layout(width = 1000, height = 500, title_text = " Personal Income with Percentage Growth")
-sub_fig.layout.xaxis.title = "State"
-sub_fig.layout.yaxis.title = " Personal Income for 2021Q2"
-sub_fig.layout.yaxis2.title = "Percentage Growth from 2017Q1 to 2021Q2"
+# personal income and percent growth of every state, sorted by personal income
+personal_income_vs_percentage_growth = income_dataset['income_vs_growth']
 
-st.plotly_chart(sub_fig)
+# bar graph of the personal income with the percentage growth as a line on a second axis
+sub_fig = get_income_with_growth_figure(personal_income_vs_percentage_growth, first_quarter, latest_quarter)
 
-# filter the rates of personal income growth list by states that are in the bottom 20 states on personal income
+with timed("plotly_chart income with growth"):
+    st.plotly_chart(sub_fig)
 
-keys = list(lowest_20_states_df['name'])
-
-#sort lowest to highest in rates of growth
-personal_income_growth_2017to2021Q2_lower_end=personal_income_growth_2017to2021Q2["DataValue"][keys].sort_values()
+# filter states to focus analysis on: the bottom 20 by personal income in the latest quarter, sorted lowest to highest in rates of growth.
+# the same screen can be run headless for many parameter combinations with screen.py
+emerging_markets = income_dataset['emerging_markets']
+personal_income_growth_2017to2021Q2_lower_end = emerging_markets["bottom_growth"]
 
 
 #plot growth in the 5 year timeframe in personal incomes for bottom 20 states in personal income
-fig5 = px.bar(personal_income_growth_2017to2021Q2_lower_end, 
-              labels = {'GeoName' : 'State', 'value': 'Percent Growth Personal Incomes 2017-2021Q2' },
-              color_discrete_sequence = ['pink']*len(personal_income_growth_2017to2021Q2_lower_end), 
-              width = 1000,
-               )
-fig5.update_layout(title_text = "Percent Growth in Personal Income 2017-2021Q2 for 20 States with lowest Personal Income", showlegend = False )
+fig5 = get_low_income_growth_figure(personal_income_growth_2017to2021Q2_lower_end, first_quarter, latest_quarter)
 
-st.plotly_chart(fig5)
+with timed("plotly_chart low income growth"):
+    st.plotly_chart(fig5)
 
 
 #create keys for the 8 states with highest personal income growth out of the bottom 20 states in personal income
-states_filter_2_keys = list(personal_income_growth_2017to2021Q2_lower_end.iloc[-8:].index)
-states_filter_keys_code = ['MS', 'KY','MT', 'IN', 'GA', 'LA','NM','UT']
+states_filter_2_keys = list(emerging_markets["targets"].index)
 
 
 st.header("Target States")
-fig6 = go.Figure(data=go.Choropleth(
-    locations=states_filter_keys_code, # Spatial coordinates
-    z = personal_income_growth_2017to2021Q2["DataValue"][states_filter_2_keys].sort_values(), # Data to be color-coded
-    locationmode = 'USA-states', # set of locations match entries in `locations`
-    colorscale = 'viridis' ,
-    colorbar_title = "Percentage",
-    autocolorscale=False,
-    #text=us_states_df['text'], # hover text
-    marker_line_color='white'# line markers between states
-    
- ))
-
-fig6.update_layout(
-        geo_scope='usa', # limite map scope to USA,
-        title_text = " Map of US with target states and their percent growth from 2017Q1 - 2021Q2",
-         height = 800
-         #margin={"r":0,"t":0,"l":0,"b":0}
-         )
-
-st.plotly_chart(fig6,use_container_width = True)
-
-st.write("These are the top 8 states chosen by growth out of the lower income states to focus on ")
-
-#read csv file from kaggle
-population_by_state_df = pd.read_csv(Path('Resources/pop_2010_2020.csv'))
-
-#filter csv file to target years, set index to the state
-population_by_state = population_by_state_df[['GeoName',
-                                             '2016','2017','2018','2019','2020']]
-population_by_state = population_by_state.set_index('GeoName')
-
-#Inserted GDP by state & industy csv file
-gdp_country_state = pd.read_csv(Path('Resources/GDP_ALL_AREAS_1997_2020.csv'))
+fig6 = get_target_states_figure(emerging_markets["targets"], first_quarter, latest_quarter)
 
-# filter by the target 8 states
-gdp_country_state=gdp_country_state[gdp_country_state["GeoName"].isin(states_filter_2_keys)]
+with timed("plotly_chart target states map"):
+    st.plotly_chart(fig6,use_container_width = True)
 
+st.write("These are the top 8 states chosen by growth out of the lower income states to focus on ")
 
-# extract list of industries
-industry_list=gdp_country_state["Description"].drop_duplicates().sort_values()
-
-
-#Filtered the data to only include GeoName, Description, Years
-gdp_state_5year = gdp_country_state[[
-    'GeoName',
-    'Description',
-    '2016','2017','2018','2019','2020']]
-
-# Replacing NA's to 0
-gdp_state_5year = gdp_state_5year.replace(["(NA)", "(L)"], 0)
-gdp_state_5year=gdp_state_5year.fillna(0)
+#GDP by state & industy is compiled once from Resources/GDP_ALL_AREAS_1997_2020.csv and population data from
+#Resources/pop_2010_2020.csv. The analysis of each industry for the target states is memoized, so reruns only render it.
+#The fixed industries below are collapsed, their charts are only built when the user opens one of them
 
-#changing strings to floats
-gdp_state_5year['2016'] = gdp_state_5year['2016'].astype('float')
-gdp_state_5year['2017'] = gdp_state_5year['2017'].astype('float')
-gdp_state_5year['2019'] = gdp_state_5year['2019'].astype('float')
-gdp_state_5year['2020'] = gdp_state_5year['2020'].astype('float')
+# list of industries, extracted once and shared by every session
+with timed("industry dataset", cached = True):
+    industry_list = get_industry_dataset()["industry_list"]
 
-#grouped by Description to pick out All industry total
-gdp_state_5year_filter = gdp_state_5year.groupby('Description')
+# window of the industry charts and growth rankings, sliced from one cube of all the years with GDP per capita data
+industry_years = get_industry_years()
+industry_start_year, industry_end_year = st.select_slider("Choose the years of the industry analysis:",
+                                                          options = industry_years,
+                                                          value = (2016, 2020))
 
 
 #Filtering All Industry df
-unstacked_gdp_capita_industry = plot_industry_analysis(gdp_state_5year_filter,population_by_state,'All industry total')
+unstacked_gdp_capita_industry = plot_industry_analysis('All industry total', states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 # filtering Agriculture
 
 
-unstacked_gdp_capita_agriculture = plot_industry_analysis(gdp_state_5year_filter,population_by_state,"  Agriculture, forestry, fishing and hunting")
+unstacked_gdp_capita_agriculture = plot_industry_analysis("  Agriculture, forestry, fishing and hunting", states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 #filtering out Healthcare df
-unstacked_gdp_capita_healthcare = plot_industry_analysis(gdp_state_5year_filter,population_by_state,"   Health care and social assistance")
+unstacked_gdp_capita_healthcare = plot_industry_analysis("   Health care and social assistance", states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 #filtering a df out for manufacturing
-unstacked_gdp_capita_manufacturing = plot_industry_analysis(gdp_state_5year_filter,population_by_state,"  Manufacturing")
+unstacked_gdp_capita_manufacturing = plot_industry_analysis("  Manufacturing", states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 #filtering df for private gdp by state
-unstacked_gdp_capita_private = plot_industry_analysis(gdp_state_5year_filter,population_by_state,' Private industries')
+unstacked_gdp_capita_private = plot_industry_analysis(' Private industries', states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 #filteting out df for Finance gdp by state
-unstacked_gdp_capita_finance = plot_industry_analysis(gdp_state_5year_filter,population_by_state,'  Finance, insurance, real estate, rental, and leasing')
+unstacked_gdp_capita_finance = plot_industry_analysis('  Finance, insurance, real estate, rental, and leasing', states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 #filtering df for transportation gdp by state
-unstacked_gdp_capita_transportation = plot_industry_analysis(gdp_state_5year_filter,population_by_state,'  Transportation and warehousing')
+unstacked_gdp_capita_transportation = plot_industry_analysis('  Transportation and warehousing', states_filter_2_keys, lazy = True, start_year = industry_start_year, end_year = industry_end_year)
 
 
 # Selectbox to input a user specified industry
-industry = st.selectbox("Choose a Industry to analyze:", gdp_country_state["Description"].drop_duplicates().sort_values())
-
-unstacked_gdp_capita_generic = plot_industry_analysis(gdp_state_5year_filter,population_by_state,industry)
+industry = st.selectbox("Choose a Industry to analyze:", industry_list)
+
+unstacked_gdp_capita_generic = plot_industry_analysis(industry, states_filter_2_keys, start_year = industry_start_year, end_year = industry_end_year)
+
+st.header("Composite ranking of the states")
+
+# every contiguous state is scored on its income level (lower ranks higher), income growth over the quarters chosen
+# above, population growth and the GDP per capita growth of any industries over the years chosen above. each metric
+# is turned into a z-score and the score is their weighted sum
+with st.expander("Weights of the metrics"):
+    composite_weights = {'Income level': st.slider("Low personal income:", 0.0, 2.0, 1.0, step = 0.1),
+                         'Income growth': st.slider("Personal income growth:", 0.0, 2.0, 1.0, step = 0.1),
+                         'Population growth': st.slider("Population growth:", 0.0, 2.0, 0.5, step = 0.1)}
+    ranking_industries = st.multiselect("GDP per capita growth of the industries:", industry_list, default = ['All industry total'])
+    for ranking_industry in ranking_industries:
+        composite_weights[ranking_industry] = st.slider(f"{ranking_industry.strip()}:", 0.0, 2.0, 1.0, step = 0.1,
+                                                        key = f"weight {ranking_industry}")
+ranking_top_k = st.slider("Number of states to rank:", 1, 48, 8)
+
+# the z-scores are built once per data version and window, shared by every session
+with timed("composite ranking", cached = True):
+    composite_ranking = get_composite_ranking(income_dataset, growth_start, growth_end, industry_start_year, industry_end_year)
+
+# a weight change only adds the change of the moved weights to the scores of the previous rerun
+with timed("composite scores"):
+    composite_weight_values = get_weights(composite_ranking, composite_weights)
+    previous_scores = st.session_state.get('composite_scores')
+    if previous_scores is not None and previous_scores[0] is composite_ranking:
+        composite_scores = update_scores(composite_ranking, previous_scores[2], previous_scores[1], composite_weight_values)
+    else:
+        composite_scores = get_scores(composite_ranking, composite_weight_values)
+    st.session_state['composite_scores'] = (composite_ranking, composite_weight_values, composite_scores)
+    top_states = get_top_k(composite_ranking, composite_scores, ranking_top_k)
+
+fig7 = get_composite_ranking_figure(top_states)
+with timed("plotly_chart composite ranking"):
+    st.plotly_chart(fig7)
+
+st.header("Emerging markets by county and metro area")
+
+# the same screen for the about 3,100 counties or 380 metro areas, only the top of the ranking is plotted.
+# the data is only downloaded and screened once the user asks for it
+geo_levels = {'county': 'Counties', 'msa': 'Metropolitan statistical areas'}
+geo_level = st.radio("Choose a geography:", list(geo_levels), format_func = lambda level: geo_levels[level])
+geo_bottom_n = st.slider("Number of lowest income areas to consider:", 50, 1000, 300, step = 50)
+geo_top_k = st.slider("Number of target areas:", 5, 50, 25)
+
+if st.checkbox("Run the screen", key = "run_geo_screen"):
+    with timed("get_Geo_Data", cached = True):
+        geo_data = get_Geo_Data(bea_api_key, geo_level)
+    with timed("screen_geographies"):
+        geo_screen = screen_geographies(geo_data, bottom_n = geo_bottom_n, top_k = geo_top_k)
+
+    if geo_screen["targets"].empty:
+        st.write(f"BEA has no personal income data for the {geo_levels[geo_level].lower()}")
+    else:
+        fig_geo = px.bar(geo_screen["targets"],
+                         labels = {'GeoName': 'Area', 'value': f"Percent Growth Personal Incomes {geo_screen['start']}-{geo_screen['end']}"},
+                         color_discrete_sequence = ['pink']*len(geo_screen["targets"]),
+                         width = 1000,
+                         height = 600)
+        fig_geo.update_layout(title_text = f"Top {geo_top_k} {geo_levels[geo_level]} by growth out of the {geo_bottom_n} with lowest Personal Income", showlegend = False)
+        with timed("plotly_chart geography targets"):
+            st.plotly_chart(fig_geo)
+
+# timings of this rerun, the same numbers go to the metrics log and endpoint when they are configured
+rerun_timings = finish_rerun()
+st.sidebar.caption(f"BEA data up to {release['latest_quarter']}")
+if st.sidebar.checkbox("Show timings of this run", key = "show_timings"):
+    st.sidebar.dataframe(rerun_timings)
 
 # Pie graphs to determine the slice of industry in the state
 # This is still under construction!!!!
@@ -0,0 +1,358 @@
+# Benchmark of the dashboard data pipeline, run headless (no Streamlit)
+# Every stage of the pipeline is timed on its own and its peak memory is traced. The stages call the functions the
+# dashboard runs, with the BEA API replaced by a local server answering with the recorded or synthetic response:
+#   bea_fetch      - fetch_bea_tables: request, decode and cache the BEA GetData response
+#   csv_load       - parse the raw GDP and population csv files
+#   compiled_load  - load the compiled GDP and population files (analyzer.ingest)
+#   string_clean   - convert the BEA DataValue strings to numbers and footnote flags, as the income history does
+#   resample       - annual means, latest quarter and growth from every quarter by geography (analyzer.income_history)
+#   income_dataset - build_income_dataset, the shared frames behind the income charts (states scale only)
+#   geo_screen     - long format and emerging markets screen of analyzer.geo_pipeline, at state or county level
+#   growth         - GDP per capita for all industries and its growth (analyzer.industry_engine)
+#   ranking        - composite ranking on the income level, income growth and every industry growth: z-scores, one
+#                    weight change with its top 25, and a sweep of 100 weight sets
+#   figures        - build and serialize the figures with analyzer.dashboard_figures: every income chart of the
+#                    dashboard at the states scale (downsampled line chart and choropleth maps included), the line chart,
+#                    screen growth and ranking of the lowest income geographies at the county scale
+#
+# Scales:
+#   states - the recorded BEA response (--fixture, e.g. a file from the BEA cache folder) and the Resources csv files.
+#            Without --fixture a synthetic response of the same size (52 areas x 18 quarters) is used
+#   county - synthetic data of county size (3,200 geographies x 100 quarters, 92 industries x 24 years). The synthetic
+#            GDP and population tables are written to a csv and a compiled file in a temporary folder first, so csv_load
+#            and compiled_load read them from disk like at the states scale
+#
+# Usage (from the project folder):
+#   python -m benchmarks.bench_pipeline --scale states county --save-baseline
+#   python -m benchmarks.bench_pipeline --scale states county --threshold 0.25
+# The second command compares with the stored baselines and exits with status 1 when a stage got slower than the
+# threshold allows.
+
+
+import gc
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analyzer.bea_fetcher import fetch_bea_tables, PER_CAPITA_INCOME_QUERY
+from analyzer.bea_values import parse_values
+from analyzer.composite_ranking import build_ranking, get_scores, get_top_k, get_weights, sweep_weights, update_scores
+from analyzer.dashboard_data import build_income_dataset
+from analyzer.dashboard_figures import (get_annual_income_figure, get_quarterly_income_figure, get_income_map_figure,
+                                        get_income_growth_figure, get_income_with_growth_figure,
+                                        get_low_income_growth_figure, get_target_states_figure,
+                                        get_composite_ranking_figure)
+from analyzer.geo_pipeline import GEO_LEVELS, screen_geographies, to_long_frame
+from analyzer.income_history import HISTORY_COLUMNS, compute_annual, compute_latest, compute_growth as compute_income_growth
+from analyzer.industry_engine import build_industry_cube, compute_growth as compute_industry_growth
+from analyzer.ingest import (GDP_CSV, POPULATION_CSV, load_gdp, load_population, get_year_columns, get_compiled_path,
+                             read_compiled, write_compiled)
+
+
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+
+# the dashboard charts only show this many geographies at county scale
+MAX_CHART_SERIES = 60
+
+
+def run_stage(name, func, results, repeat=1):
+    # keeps the fastest wall time of repeat runs, the peak memory is traced in one extra run because
+    # tracing slows python code down too much to time it at the same time
+    best_seconds = None
+    output = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        output = func()
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results[name] = {"seconds": best_seconds, "peak_mb": peak_bytes / 1024 / 1024}
+    return output
+
+
+def serve_response(response):
+    # local stand in for the BEA API, answers every query with the response
+    body = json.dumps(response).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_bea_response(geo_names, geo_fips, quarters, seed=0):
+    # synthetic GetData response shaped like SQINC1 line 3
+    random = np.random.default_rng(seed)
+    base = random.uniform(30000, 80000, len(geo_names))
+    growth = random.uniform(0.002, 0.02, len(geo_names))
+    values = base[:, np.newaxis] * (1 + growth[:, np.newaxis]) ** np.arange(len(quarters))
+    return {"BEAAPI": {"Results": {"Data": [
+        {"Code": "SQINC1-3", "GeoFips": geo_fips[geo_index], "GeoName": geo_name, "TimePeriod": quarter,
+         "CL_UNIT": "Dollars", "UNIT_MULT": "0", "DataValue": f"{values[geo_index, quarter_index]:,.0f}"}
+        for geo_index, geo_name in enumerate(geo_names) for quarter_index, quarter in enumerate(quarters)]}}}
+
+
+def get_quarters(first_year, count):
+    return [f"{first_year + index // 4}Q{index % 4 + 1}" for index in range(count)]
+
+
+def make_gdp(geo_names, industries, years, seed=1):
+    random = np.random.default_rng(seed)
+    values = random.uniform(10, 100000, (len(geo_names) * len(industries), len(years)))
+    gdp = pd.DataFrame(values, columns=[str(year) for year in years])
+    gdp.insert(0, "GeoName", np.repeat(geo_names, len(industries)))
+    gdp.insert(1, "Description", np.tile(industries, len(geo_names)))
+    return gdp
+
+
+def make_population(geo_names, years, seed=2):
+    random = np.random.default_rng(seed)
+    population = pd.DataFrame(random.uniform(1000, 1000000, (len(geo_names), len(years))),
+                              columns=[str(year) for year in years])
+    population.insert(0, "GeoName", geo_names)
+    return population
+
+
+def write_tables(gdp, population, folder):
+    # writes the tables as csv and compiled files, returns their paths
+    paths = {}
+    for name, frame in [("gdp", gdp), ("population", population)]:
+        csv_path = Path(folder) / f"{name}.csv"
+        frame.to_csv(csv_path, index=False)
+        compiled_path = get_compiled_path(name, Path(folder))
+        write_compiled(frame, compiled_path)
+        paths[name] = (csv_path, compiled_path)
+    return paths
+
+
+def get_scale_inputs(scale, fixture=None, folder=None):
+    # returns the raw BEA response, its query and geography level, and loaders of the raw and compiled GDP and
+    # population tables. The county tables are written to folder
+    if scale == "states":
+        if fixture is not None:
+            with open(fixture) as f:
+                response = json.load(f)
+            # files from the BEA cache folder wrap the response with the query
+            response = response.get("response", response)
+        else:
+            # the US total and the states in alphabetical order, with their FIPS codes
+            geo_names = ["United States"] + list(load_population()["GeoName"])
+            geo_fips = [f"{index * 1000:05d}" for index in range(len(geo_names))]
+            response = make_bea_response(geo_names, geo_fips, get_quarters(2017, 18))
+        return {
+            "response": response,
+            "query": PER_CAPITA_INCOME_QUERY,
+            "level": "state",
+            "raw_tables": lambda: (pd.read_csv(GDP_CSV), pd.read_csv(POPULATION_CSV)),
+            "compiled_tables": lambda: (load_gdp(), load_population()),
+        }
+
+    geo_names = [f"County {index:04d}" for index in range(3200)]
+    geo_fips = [f"{(index // 100 + 1) * 1000 + index % 100 + 1:05d}" for index in range(3200)]
+    industries = [f"Industry {index:02d}" for index in range(92)]
+    years = list(range(1997, 2021))
+    paths = write_tables(make_gdp(geo_names, industries, years), make_population(geo_names, years), folder)
+    return {
+        "response": make_bea_response(geo_names, geo_fips, get_quarters(1997, 100)),
+        "query": GEO_LEVELS["county"],
+        "level": "county",
+        "raw_tables": lambda: (pd.read_csv(paths["gdp"][0]), pd.read_csv(paths["population"][0])),
+        "compiled_tables": lambda: (read_compiled(paths["gdp"][1]), read_compiled(paths["population"][1])),
+    }
+
+
+def fetch_response(inputs, repeat, results):
+    # fetch_bea_tables against a local server with the response, refresh=True so every run goes to the server
+    server = serve_response(inputs["response"])
+    settings = {"BEA_API_URL": f"http://127.0.0.1:{server.server_address[1]}/api/data", "BEA_OFFLINE": ""}
+    saved = {name: os.environ.get(name) for name in ["BEA_API_URL", "BEA_CACHE_DIR", "BEA_OFFLINE"]}
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.environ.update(settings, BEA_CACHE_DIR=cache_dir)
+            rows, _ = run_stage("bea_fetch", lambda: fetch_bea_tables("bench", [inputs["query"]], refresh=True),
+                                results, repeat)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.shutdown()
+        server.server_close()
+    return rows
+
+
+def run_pipeline(scale, fixture=None, repeat=1):
+    with tempfile.TemporaryDirectory() as folder:
+        inputs = get_scale_inputs(scale, fixture, folder)
+        return run_stages(scale, inputs, repeat)
+
+
+def run_stages(scale, inputs, repeat):
+    results = {}
+
+    rows = fetch_response(inputs, repeat, results)
+    run_stage("csv_load", inputs["raw_tables"], results, repeat)
+    gdp, population = run_stage("compiled_load", inputs["compiled_tables"], results, repeat)
+
+    def clean():
+        history = rows[HISTORY_COLUMNS].copy()
+        history["DataValue"], history["DataFlag"] = parse_values(history["DataValue"])
+        return history
+    history = run_stage("string_clean", clean, results, repeat)
+
+    def resample():
+        latest = compute_latest(history)
+        return {"annual": compute_annual(history), "latest": latest, "growth": compute_income_growth(history, latest)}
+    aggregates = run_stage("resample", resample, results, repeat)
+
+    income_dataset = None
+    if scale == "states":
+        income_dataset = run_stage("income_dataset", lambda: build_income_dataset(history, aggregates), results, repeat)
+
+    geo_screen = run_stage("geo_screen", lambda: screen_geographies(to_long_frame(rows, inputs["level"]), 20, 8),
+                           results, repeat)
+
+    years = get_year_columns(gdp)[-5:]
+    population_by_geo = population.set_index("GeoName")
+
+    def growth():
+        industry_cube = build_industry_cube(gdp, population_by_geo, years)
+        return compute_industry_growth(industry_cube, None, years[0], years[-1], years[-2])
+    industry_growth, _ = run_stage("growth", growth, results, repeat)
+
+    latest = aggregates["latest"]
+    first_quarter = history["TimePeriod"].min()
+
+    def ranking():
+        metrics = pd.concat([latest["DataValue"].rename("Income level"),
+                             aggregates["growth"][first_quarter].rename("Income growth"), industry_growth.T], axis=1)
+        composite = build_ranking(metrics, {"Income level": -1})
+        weights = get_weights(composite, {"Income level": 1, "Income growth": 1})
+        scores = get_scores(composite, weights)
+        new_weights = weights.copy()
+        new_weights[2] = 0.5
+        top = get_top_k(composite, update_scores(composite, scores, weights, new_weights), 25)
+        sweep = sweep_weights(composite, np.random.default_rng(3).uniform(0, 2, (100, len(weights))), 25)
+        return top, sweep
+    top, _ = run_stage("ranking", ranking, results, repeat)
+
+    def figures():
+        if income_dataset is not None:
+            charts = state_figures(income_dataset, top)
+        else:
+            # the line chart of the lowest income geographies, the growth of the screened ones and the ranking
+            shown = latest["DataValue"].nsmallest(MAX_CHART_SERIES).index
+            by_quarter = history[history["GeoName"].isin(shown)].pivot_table(index="TimePeriod", columns="GeoName",
+                                                                             values="DataValue", aggfunc="last")
+            by_quarter.index = pd.PeriodIndex(by_quarter.index, freq="Q").to_timestamp()
+            charts = [get_quarterly_income_figure(by_quarter),
+                      get_low_income_growth_figure(geo_screen["bottom_growth"], geo_screen["start"], geo_screen["end"]),
+                      get_composite_ranking_figure(top)]
+        return [chart.to_json() for chart in charts]
+    run_stage("figures", figures, results, repeat)
+
+    return results
+
+
+def state_figures(income_dataset, top):
+    # every income chart of the dashboard with its default selections
+    first_quarter, latest_quarter = income_dataset["first_quarter"], income_dataset["latest_quarter"]
+    annual = income_dataset["annual"]
+    emerging_markets = income_dataset["emerging_markets"]
+    return [
+        get_annual_income_figure(annual, annual.index[-1]),
+        get_quarterly_income_figure(income_dataset["quarterly_wide"]),
+        get_income_map_figure(income_dataset["us_states"], latest_quarter),
+        get_income_growth_figure(income_dataset["growth"], first_quarter, latest_quarter, len(annual)),
+        get_income_with_growth_figure(income_dataset["income_vs_growth"], first_quarter, latest_quarter),
+        get_low_income_growth_figure(emerging_markets["bottom_growth"], first_quarter, latest_quarter),
+        get_target_states_figure(emerging_markets["targets"], first_quarter, latest_quarter),
+        get_composite_ranking_figure(top),
+    ]
+
+
+def load_baselines():
+    if not BASELINES.exists():
+        return {}
+    with open(BASELINES) as f:
+        return json.load(f)
+
+
+def find_regressions(scale, results, baselines, threshold, min_seconds=0.005):
+    # stages slower than the baseline by more than threshold (and by more than min_seconds, to ignore timer noise)
+    regressions = []
+    for stage, result in results.items():
+        baseline = baselines.get(scale, {}).get(stage)
+        if baseline is None:
+            continue
+        allowed = baseline["seconds"] * (1 + threshold)
+        if result["seconds"] > allowed and result["seconds"] - baseline["seconds"] > min_seconds:
+            regressions.append((stage, baseline["seconds"], result["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline")
+    parser.add_argument("--scale", nargs="+", choices=["states", "county"], default=["states"])
+    parser.add_argument("--fixture", help="recorded BEA GetData response (json) for the states scale")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest one is kept")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against the baseline, 0.25 = 25%%")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results as baselines in {BASELINES.name}")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    all_regressions = []
+    for scale in args.scale:
+        results = run_pipeline(scale, args.fixture, args.repeat)
+        print(f"\n{scale}")
+        print(f"{'stage':<15}{'seconds':>10}{'peak MB':>10}{'baseline':>10}")
+        for stage, result in results.items():
+            baseline = baselines.get(scale, {}).get(stage, {}).get("seconds")
+            baseline_text = "" if baseline is None else f"{baseline:.4f}"
+            print(f"{stage:<15}{result['seconds']:>10.4f}{result['peak_mb']:>10.1f}{baseline_text:>10}")
+
+        regressions = find_regressions(scale, results, baselines, args.threshold)
+        for stage, baseline_seconds, seconds in regressions:
+            print(f"REGRESSION {scale}/{stage}: {seconds:.4f}s against a baseline of {baseline_seconds:.4f}s")
+        all_regressions.extend(regressions)
+
+        if args.save_baseline:
+            baselines[scale] = results
+
+    if args.save_baseline:
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"\nbaselines saved to {BASELINES}")
+
+    return 1 if all_regressions and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
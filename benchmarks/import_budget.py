@@ -0,0 +1,88 @@
+# Start up budget of the dashboard
+# Runs the imports of app.py in a fresh interpreter with `python -X importtime`, which is what every new Streamlit
+# worker or replica pays before the first rerun. Reports the total import time, the wall time of the process and the
+# slowest packages, and exits with status 1 when the total is over the budget.
+#
+# Only the import statements of the script are run (found with ast), so no BEA call or Streamlit server is needed.
+#
+# Usage (from the project folder):
+#   python -m benchmarks.import_budget
+#   python -m benchmarks.import_budget --script app.py --budget 1.5 --top 25
+
+
+import ast
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+
+PROJECT = Path(__file__).resolve().parent.parent
+
+
+def get_import_code(script):
+    # the top level import statements of the script, in order
+    tree = ast.parse(Path(script).read_text(), filename=str(script))
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.get_source_segment(Path(script).read_text(), node) for node in imports)
+
+
+def run_imports(import_code):
+    # returns the wall time of the interpreter and the -X importtime lines it printed
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", import_code], cwd=PROJECT,
+                               capture_output=True, text=True)
+    wall_seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return wall_seconds, completed.stderr.splitlines()
+
+
+def parse_importtime(lines):
+    # (package, self seconds, cumulative seconds, depth) of every imported module
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # one space after the bar, then two more for every level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the dashboard against a budget")
+    parser.add_argument("--script", default="app.py", help="script whose imports are profiled")
+    parser.add_argument("--budget", type=float, default=2.0, help="allowed total import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="runs, the fastest one is reported")
+    parser.add_argument("--top", type=int, default=15, help="number of packages listed")
+    args = parser.parse_args()
+
+    import_code = get_import_code(PROJECT / args.script)
+    runs = [run_imports(import_code) for _ in range(args.repeat)]
+    wall_seconds, lines = min(runs, key=lambda run: run[0])
+    modules = parse_importtime(lines)
+
+    # modules imported at the top level of the script, their cumulative times add up to the total
+    top_level = [module for module in modules if module[3] == 0]
+    total_seconds = sum(module[2] for module in top_level)
+
+    print(f"{args.script}: {len(modules)} modules imported in {total_seconds:.3f}s "
+          f"(process wall time {wall_seconds:.3f}s, budget {args.budget:.3f}s)")
+    print(f"\n{'top level import':<45}{'cumulative':>12}")
+    for name, _, cumulative_seconds, _ in sorted(top_level, key=lambda module: -module[2])[:args.top]:
+        print(f"{name:<45}{cumulative_seconds:>12.3f}")
+    print(f"\n{'slowest modules (self time)':<45}{'self':>12}")
+    for name, self_seconds, _, _ in sorted(modules, key=lambda module: -module[1])[:args.top]:
+        print(f"{name:<45}{self_seconds:>12.3f}")
+
+    if total_seconds > args.budget:
+        print(f"\nOVER BUDGET: {total_seconds:.3f}s of imports against a budget of {args.budget:.3f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,51 @@
+# Static snapshot export of the dashboard
+# Runs the data pipeline of app.py once and writes every figure (the annual chart for every year, the line chart, both
+# maps, the growth charts and the charts of every industry) to Plotly json and html files, with a gzipped data bundle,
+# a manifest and an index page. The output folder can be served as is by any static file server.
+#
+# Example:
+#   python export_snapshot.py --output snapshot
+#   python export_snapshot.py --output snapshot --format json --industry "All industry total" "  Manufacturing"
+#   python -m http.server --directory snapshot
+#
+# The personal income data comes from the BEA API through the disk cache, set BEA_OFFLINE=1 to only use cached data
+
+
+import os
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+from analyzer.bea_fetcher import PER_CAPITA_INCOME_QUERY
+from analyzer.dashboard_data import build_income_dataset, build_industry_dataset
+from analyzer.income_history import refresh_income_history, update_income_aggregates
+from analyzer.snapshot import export_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every dashboard figure to static files")
+    parser.add_argument("--output", default="snapshot", help="folder the snapshot is written to")
+    parser.add_argument("--format", nargs="+", choices=["html", "json"], default=["html", "json"],
+                        help="figure file formats")
+    parser.add_argument("--industry", nargs="+", default=None,
+                        help="GDP Description lines to export (exactly as in the GDP table), all industries by default")
+    parser.add_argument("--start-year", type=int, default=2016, help="first year of the industry analysis")
+    parser.add_argument("--end-year", type=int, default=2020, help="last year of the industry analysis")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, default one per cpu")
+    args = parser.parse_args()
+
+    load_dotenv()
+    start_time = time.perf_counter()
+    personal_income_history, changed_periods = refresh_income_history(os.getenv("BEA_API_KEY"), PER_CAPITA_INCOME_QUERY)
+    income_aggregates = update_income_aggregates(PER_CAPITA_INCOME_QUERY, personal_income_history, changed_periods)
+    income_dataset = build_income_dataset(personal_income_history, income_aggregates)
+
+    industries = args.industry if args.industry is not None else list(build_industry_dataset()["industry_list"])
+    manifest = export_snapshot(income_dataset, industries, args.output, args.format, args.start_year, args.end_year,
+                               max_workers=args.workers)
+    print(f"{len(manifest['figures'])} figures exported in {time.perf_counter() - start_time:.1f}s to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
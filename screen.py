@@ -0,0 +1,67 @@
+# Headless emerging markets screen
+# Runs the screen of the dashboard for every combination of the given parameters on a process pool and writes the
+# ranked target states of every scenario to a results file (csv, or json when the file name ends with .json).
+#
+# Example:
+#   python screen.py --bottom-n 15 20 25 --top-k 5 8 --industry "All industry total" "  Manufacturing" \
+#                    --output screen_results.csv
+#
+# The growth window runs from the first to the latest quarter of the last five years BEA publishes, --start and --end
+# take other quarters within them. A scenario with a quarter outside the data is skipped and reported.
+#
+# The personal income data comes from the BEA API through the disk cache, set BEA_OFFLINE=1 to only use cached data
+
+
+import os
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+from analyzer.bea_fetcher import fetch_bea_tables, PER_CAPITA_INCOME_QUERY
+from analyzer.bea_values import parse_values
+from analyzer.screening import get_scenarios, run_scenarios
+
+
+def get_personal_income(bea_api_key):
+    personal_income, _ = fetch_bea_tables(bea_api_key, [PER_CAPITA_INCOME_QUERY])
+    # DataFlag keeps the BEA footnote code of the suppressed values
+    personal_income = personal_income[["GeoName", "TimePeriod", "DataValue"]].copy()
+    personal_income["DataValue"], personal_income["DataFlag"] = parse_values(personal_income["DataValue"])
+    return personal_income
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the emerging markets screen for many parameter combinations")
+    parser.add_argument("--bottom-n", type=int, nargs="+", default=[20], help="size of the low income pool")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[8], help="number of target states")
+    parser.add_argument("--start", nargs="+", default=[None],
+                        help="first quarter of the growth window, default the first quarter of the data")
+    parser.add_argument("--end", nargs="+", default=[None],
+                        help="last quarter of the growth window, default the latest quarter of the data")
+    parser.add_argument("--industry", nargs="+", default=[None],
+                        help="GDP Description lines to rank the targets by (exactly as in the GDP table)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, default one per cpu")
+    parser.add_argument("--output", default="screen_results.csv", help="results file, .csv or .json")
+    args = parser.parse_args()
+
+    load_dotenv()
+    personal_income = get_personal_income(os.getenv("BEA_API_KEY"))
+
+    scenarios = get_scenarios(args.bottom_n, args.top_k, args.start, args.end, args.industry)
+    start_time = time.perf_counter()
+    results = run_scenarios(personal_income, scenarios, max_workers=args.workers)
+
+    if "error" in results:
+        for scenario_id, error in results.dropna(subset=["error"])[["scenario_id", "error"]].itertuples(index=False):
+            print(f"scenario {scenario_id} skipped: {error}")
+
+    if args.output.endswith(".json"):
+        results.to_json(args.output, orient="records", indent=2)
+    else:
+        results.to_csv(args.output, index=False)
+    print(f"{len(scenarios)} scenarios screened in {time.perf_counter() - start_time:.1f}s, results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Local stand in for the BEA API
+# The bea_stub fixture serves the responses it is given on a free local port and points BEA_API_URL at it, with the
+# response cache in a fresh temporary folder. Responses are looked up by the TableName of the query, or by its method
+# when it has none (e.g. "getdatasetlist"), both lower case. It starts with the responses recorded in fixtures/bea
+# (<tablename or method>.json), tests can replace or add any of them. A query without a response gets the error reply
+# BEA sends for a missing parameter, with a 200 status like BEA does.
+
+
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "bea"
+
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / f"{name}.json") as f:
+        return json.load(f)
+
+
+def get_error_response(message="The dataset requested requires parameter TableName"):
+    return {"BEAAPI": {"Error": {"APIErrorCode": "3", "APIErrorDescription": message}}}
+
+
+def get_data_response(rows):
+    return {"BEAAPI": {"Results": {"Data": rows}}}
+
+
+class BEAStub:
+    def __init__(self):
+        self.responses = {path.stem: load_fixture(path.stem) for path in FIXTURES_DIR.glob("*.json")}
+        self.queries = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/data"
+
+    def get_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {name.lower(): values[0]
+                         for name, values in urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).items()}
+                stub.queries.append(query)
+                key = query.get("tablename", query.get("method", "")).lower()
+                body = json.dumps(stub.responses.get(key, get_error_response())).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def bea_stub(monkeypatch, tmp_path):
+    stub = BEAStub()
+    stub.start()
+    monkeypatch.setenv("BEA_API_URL", stub.url)
+    monkeypatch.setenv("BEA_CACHE_DIR", str(tmp_path / "bea_cache"))
+    monkeypatch.delenv("BEA_OFFLINE", raising=False)
+    monkeypatch.delenv("BEA_CACHE_TTL", raising=False)
+    monkeypatch.delenv("BEA_CACHE_MAX_MB", raising=False)
+    yield stub
+    stub.stop()
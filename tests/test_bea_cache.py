@@ -0,0 +1,123 @@
+# Disk cache of the BEA API responses, against the local stub of the BEA API (conftest.py) replaying the responses
+# recorded in fixtures/bea
+
+
+import os
+import time
+
+import pytest
+
+from conftest import load_fixture
+from analyzer.bea_cache import bea_request, get_cache_settings
+from analyzer.bea_fetcher import fetch_bea_tables, PER_CAPITA_INCOME_QUERY
+
+
+def get_query(table_name="SQINC1", year="LAST5", user_id="key"):
+    return {"UserID": user_id, "method": "GetData", "datasetname": "Regional", "TableName": table_name, "LineCode": 3,
+            "GeoFIPS": "STATE", "Year": year, "ResultFormat": "JSON"}
+
+
+def get_cache_files():
+    return sorted(get_cache_settings()["cache_dir"].glob("*.json"))
+
+
+def set_age(path, seconds):
+    modified = time.time() - seconds
+    os.utime(path, (modified, modified))
+
+
+def test_response_is_cached(bea_stub):
+    assert bea_request(get_query()) == load_fixture("sqinc1")
+    assert len(bea_stub.queries) == 1
+    assert len(get_cache_files()) == 1
+
+    # the API key is not part of the cache key, parameter names are case insensitive
+    assert bea_request(get_query(user_id="other key")) == load_fixture("sqinc1")
+    assert bea_request({name.upper(): value for name, value in get_query().items()}) == load_fixture("sqinc1")
+    assert len(bea_stub.queries) == 1
+
+
+def test_stale_response_is_fetched_again(bea_stub, monkeypatch):
+    monkeypatch.setenv("BEA_CACHE_TTL", "60")
+    bea_request(get_query())
+    [cache_file] = get_cache_files()
+
+    set_age(cache_file, 30)
+    bea_request(get_query())
+    assert len(bea_stub.queries) == 1
+
+    set_age(cache_file, 120)
+    bea_request(get_query())
+    assert len(bea_stub.queries) == 2
+    assert time.time() - cache_file.stat().st_mtime < 60
+
+
+def test_refresh_skips_fresh_response(bea_stub):
+    bea_request(get_query())
+    bea_stub.responses["sqinc1"] = load_fixture("getdatasetlist")
+    assert bea_request(get_query(), refresh=True) == load_fixture("getdatasetlist")
+    assert bea_request(get_query()) == load_fixture("getdatasetlist")
+    assert len(bea_stub.queries) == 2
+
+
+def test_least_recently_used_responses_are_evicted(bea_stub, monkeypatch):
+    bea_request(get_query(year="2019"))
+    [first_file] = get_cache_files()
+    set_age(first_file, 300)
+
+    # room for two responses of this size
+    monkeypatch.setenv("BEA_CACHE_MAX_MB", str(2.5 * first_file.stat().st_size / 1024 / 1024))
+    bea_request(get_query(year="2020"))
+    [second_file] = [path for path in get_cache_files() if path != first_file]
+    set_age(second_file, 200)
+
+    # reading the first response makes the second one the least recently used
+    bea_request(get_query(year="2019"))
+    bea_request(get_query(year="2021"))
+    assert len(bea_stub.queries) == 3
+    assert first_file.exists()
+    assert not second_file.exists()
+    assert len(get_cache_files()) == 2
+
+    bea_request(get_query(year="2020"))
+    assert len(bea_stub.queries) == 4
+
+
+def test_offline_miss_raises(bea_stub, monkeypatch):
+    monkeypatch.setenv("BEA_OFFLINE", "1")
+    with pytest.raises(LookupError):
+        bea_request(get_query())
+    assert bea_stub.queries == []
+
+
+def test_offline_serves_stale_response(bea_stub, monkeypatch):
+    bea_request(get_query())
+    [cache_file] = get_cache_files()
+    set_age(cache_file, 10 * 24 * 60 * 60)
+
+    monkeypatch.setenv("BEA_OFFLINE", "1")
+    assert bea_request(get_query()) == load_fixture("sqinc1")
+    assert bea_request(get_query(), refresh=True) == load_fixture("sqinc1")
+    assert len(bea_stub.queries) == 1
+
+
+@pytest.mark.parametrize("table_name", ["SQINC9", "SQINC0"])
+def test_error_replies_are_not_cached(bea_stub, table_name):
+    # SQINC9 is a recorded error in the results, the stub answers SQINC0 with an error next to them
+    response = bea_request(get_query(table_name))
+    assert "Error" in response["BEAAPI"] or "Error" in response["BEAAPI"]["Results"]
+    assert get_cache_files() == []
+
+    bea_request(get_query(table_name))
+    assert len(bea_stub.queries) == 2
+
+
+def test_fetch_bea_tables(bea_stub):
+    rows, timings = fetch_bea_tables("key", [PER_CAPITA_INCOME_QUERY])
+    assert len(rows) == len(load_fixture("sqinc1")["BEAAPI"]["Results"]["Data"])
+    assert set(rows["GeoName"]) == {"United States", "Alabama", "Mississippi", "West Virginia"}
+    assert (rows["TableName"] == "SQINC1").all()
+    assert timings["rows"].sum() == len(rows)
+
+    with pytest.raises(ValueError):
+        fetch_bea_tables("key", [{"TableName": "SQINC9", "LineCode": 3}])
@@ -0,0 +1,77 @@
+# Parsing of BEA data values and their footnote flags
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyzer.bea_values import FLAG_CODES, SUPPRESSION_CODES, UNKNOWN_CODE, parse_frame, parse_values
+
+
+def test_thousands_separators():
+    values, flags = parse_values(["52,345", "1,234,567.5", "987", "-1,200"])
+    np.testing.assert_array_equal(values, [52345, 1234567.5, 987, -1200])
+    assert flags.isna().all()
+
+
+@pytest.mark.parametrize("code", list(SUPPRESSION_CODES))
+def test_footnote_codes(code):
+    values, flags = parse_values([code, f" {code}", f"{code}  ", "1,000"])
+    assert np.isnan(values[:3]).all()
+    assert values[3] == 1000
+    assert list(flags[:3]) == [code] * 3
+    assert pd.isna(flags[3])
+
+
+def test_empty_cells_are_not_available():
+    values, flags = parse_values(["", "   ", None, np.nan, "12"])
+    assert np.isnan(values[:4]).all()
+    assert list(flags[:4]) == ["(NA)"] * 4
+    assert pd.isna(flags[4])
+
+
+def test_unknown_text():
+    values, flags = parse_values(["n/a", "(Q)", "12"])
+    assert np.isnan(values[:2]).all()
+    assert list(flags[:2]) == [UNKNOWN_CODE] * 2
+
+
+def test_numbers_pass_through():
+    values, flags = parse_values(np.array([1.5, 2, np.nan]))
+    np.testing.assert_array_equal(values, [1.5, 2, np.nan])
+    assert values.dtype == "float64"
+    assert list(flags.isna()) == [True, True, False]
+    assert flags[2] == "(NA)"
+
+    values, _ = parse_values(pd.Series([1, "2,000", 3.5], dtype=object))
+    np.testing.assert_array_equal(values, [1, 2000, 3.5])
+
+
+def test_empty_input():
+    values, flags = parse_values([])
+    assert len(values) == 0 and values.dtype == "float64"
+    assert len(flags) == 0
+    assert list(flags.categories) == list(FLAG_CODES)
+
+
+def test_parse_frame():
+    frame = pd.DataFrame({"GeoName": ["Alabama", "Alaska", "Arizona"],
+                          "2019": ["1,000", "(D)", " (NA) "],
+                          "2020": [1.0, np.nan, 3.0]})
+    parsed, flags = parse_frame(frame, ["2019", "2020"])
+
+    assert list(parsed["GeoName"]) == list(frame["GeoName"])
+    np.testing.assert_array_equal(parsed["2019"], [1000, np.nan, np.nan])
+    np.testing.assert_array_equal(parsed["2020"], [1, np.nan, 3])
+    assert list(flags.columns) == ["2019", "2020"]
+    assert flags.index.equals(frame.index)
+    assert list(flags["2019"].astype(object).fillna("")) == ["", "(D)", "(NA)"]
+    assert list(flags["2020"].astype(object).fillna("")) == ["", "(NA)", ""]
+    # the input frame is left as it was
+    assert frame["2019"].iloc[0] == "1,000"
+
+
+def test_parse_frame_empty():
+    parsed, flags = parse_frame(pd.DataFrame({"GeoName": [], "2020": []}, dtype=object), ["2020"])
+    assert parsed.empty and flags.empty
+    assert parsed["2020"].dtype == "float64"
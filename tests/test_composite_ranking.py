@@ -0,0 +1,91 @@
+# Composite ranking on weighted z-scores
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyzer.composite_ranking import (build_ranking, get_scores, get_top_k, get_top_positions, get_weights,
+                                        sweep_weights, update_scores)
+
+
+def get_metrics(geography_count=48, metric_count=6, seed=0):
+    random = np.random.default_rng(seed)
+    metrics = pd.DataFrame(random.normal(0, 1, (geography_count, metric_count)),
+                           index=pd.Index([f"State {i:02d}" for i in range(geography_count)], name="GeoName"),
+                           columns=[f"Metric {j}" for j in range(metric_count)])
+    metrics = metrics.mask(random.random(metrics.shape) < 0.05)
+    return metrics
+
+
+def test_z_scores():
+    metrics = get_metrics()
+    ranking = build_ranking(metrics, {"Metric 0": -1})
+    z = ranking["z"]
+
+    # oriented z-scores of the present values, 0 for the missing ones
+    expected = (metrics - metrics.mean()) / metrics.std(ddof=0)
+    expected["Metric 0"] = -expected["Metric 0"]
+    np.testing.assert_allclose(z, expected.fillna(0).to_numpy())
+    assert list(ranking["geographies"]) == list(metrics.index)
+    assert list(ranking["metrics"]) == list(metrics.columns)
+
+
+def test_constant_and_missing_metrics_score_zero():
+    metrics = get_metrics()
+    metrics["Metric 1"] = 5.0
+    metrics["Metric 2"] = np.nan
+    z = build_ranking(metrics)["z"]
+    assert (z[:, 1] == 0).all()
+    assert (z[:, 2] == 0).all()
+    assert np.isfinite(z).all()
+
+
+def test_update_scores_equals_recomputed_scores():
+    ranking = build_ranking(get_metrics())
+    weights = get_weights(ranking, {"Metric 0": 1, "Metric 1": 0.5, "Metric 3": 2})
+    scores = get_scores(ranking, weights)
+
+    # one, two and most weights changed
+    for changes in [{"Metric 1": 1.5}, {"Metric 2": 0.3, "Metric 5": 1}, {f"Metric {j}": j / 3 for j in range(5)}]:
+        new_weights = weights.copy()
+        for metric, weight in changes.items():
+            new_weights[list(ranking["metrics"]).index(metric)] = weight
+        updated = update_scores(ranking, scores, weights, new_weights)
+        np.testing.assert_allclose(updated, get_scores(ranking, new_weights))
+        weights, scores = new_weights, updated
+
+
+@pytest.mark.parametrize("k", [1, 5, 47, 48, 60])
+def test_top_positions_1d(k):
+    scores = np.random.default_rng(1).normal(0, 1, 48)
+    np.testing.assert_array_equal(get_top_positions(scores, k), np.argsort(-scores, kind="stable")[:k])
+
+
+@pytest.mark.parametrize("k", [1, 5, 48, 60])
+def test_top_positions_2d(k):
+    scores = np.random.default_rng(2).normal(0, 1, (48, 7))
+    np.testing.assert_array_equal(get_top_positions(scores, k), np.argsort(-scores, axis=0, kind="stable")[:k])
+
+
+def test_top_k():
+    ranking = build_ranking(get_metrics())
+    scores = get_scores(ranking, np.ones(6))
+    top = get_top_k(ranking, scores, 8)
+    expected = pd.Series(scores, index=ranking["geographies"]).sort_values(ascending=False)[:8]
+    assert list(top.index) == list(expected.index)
+    np.testing.assert_allclose(top.to_numpy(), expected.to_numpy())
+
+
+def test_sweep_weights_matches_top_k():
+    ranking = build_ranking(get_metrics())
+    weight_sets = np.random.default_rng(3).uniform(0, 2, (20, 6))
+    sweep = sweep_weights(ranking, weight_sets, 5)
+    assert len(sweep) == 20 * 5
+
+    for sweep_id, weights in enumerate(weight_sets):
+        rows = sweep[sweep["sweep"] == sweep_id]
+        top = get_top_k(ranking, get_scores(ranking, weights), 5)
+        assert list(rows["rank"]) == [1, 2, 3, 4, 5]
+        assert list(rows["geography"]) == list(top.index)
+        np.testing.assert_allclose(rows["score"].to_numpy(), top.to_numpy())
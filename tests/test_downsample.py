@@ -0,0 +1,41 @@
+# Largest-Triangle-Three-Buckets downsampling of the line charts
+
+
+import numpy as np
+import pytest
+
+from analyzer.downsample import lttb_positions
+
+
+def get_series(n, series_count, seed=0):
+    random = np.random.default_rng(seed)
+    x = np.cumsum(random.uniform(0.5, 2, n))
+    values = np.cumsum(random.normal(0, 1, (n, series_count)), axis=0)
+    values[random.random((n, series_count)) < 0.05] = np.nan
+    return x, values
+
+
+@pytest.mark.parametrize("n, max_points", [(10, 9), (20, 3), (100, 7), (1000, 300), (1001, 1000)])
+def test_positions(n, max_points):
+    x, values = get_series(n, 4)
+    positions = lttb_positions(x, values, max_points)
+
+    assert positions.shape == (max_points, 4)
+    assert (positions[0] == 0).all()
+    assert (positions[-1] == n - 1).all()
+    assert (np.diff(positions, axis=0) > 0).all()
+
+
+def test_peak_is_kept():
+    x = np.arange(100, dtype="float64")
+    values = np.zeros((100, 1))
+    values[37, 0] = 10
+    assert 37 in lttb_positions(x, values, 10)[:, 0]
+
+
+@pytest.mark.parametrize("max_points", [50, 60, 2])
+def test_passthrough(max_points):
+    # nothing to drop (or too few points to keep the ends and a bucket), every point is kept
+    x, values = get_series(50, 3)
+    positions = lttb_positions(x, values, max_points)
+    np.testing.assert_array_equal(positions, np.repeat(np.arange(50)[:, np.newaxis], 3, axis=1))
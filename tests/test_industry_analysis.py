@@ -0,0 +1,40 @@
+# Industry analysis on the cube of GDP per capita
+
+
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from analyzer import industry_analysis as analysis
+from analyzer.ingest import GDP_CSV, read_gdp_csv
+
+
+STATES = ["Alabama", "Mississippi", "Ohio"]
+
+
+@pytest.fixture
+def gdp_csv(tmp_path, monkeypatch):
+    # a copy of the GDP csv the analysis reads instead of the one in Resources
+    csv_path = tmp_path / GDP_CSV.name
+    shutil.copy(GDP_CSV, csv_path)
+    monkeypatch.setattr(analysis, "GDP_CSV", csv_path)
+    monkeypatch.setattr(analysis, "load_gdp", lambda: read_gdp_csv(csv_path)[0])
+    return csv_path
+
+
+def test_changed_csv_rebuilds_the_cube(gdp_csv):
+    before = analysis.industry_analysis("  Manufacturing", STATES)
+    assert analysis.get_industry_cube() is analysis.get_industry_cube()
+
+    # a new Description line in the csv, as in a new release of the GDP table
+    gdp = pd.read_csv(gdp_csv)
+    new_lines = gdp[gdp["Description"] == "  Manufacturing"].assign(Description="  New industry")
+    pd.concat([gdp, new_lines]).to_csv(gdp_csv, index=False)
+    modified = os.stat(gdp_csv).st_mtime + 10
+    os.utime(gdp_csv, (modified, modified))
+
+    after = analysis.industry_analysis("  New industry", STATES)
+    pd.testing.assert_series_equal(after["growth_rank"], before["growth_rank"], check_names=False)
+    assert "  New industry" in analysis.get_industry_growth(tuple(STATES), 2016, 2020)[0].index
@@ -0,0 +1,19 @@
+# Compiled files of the csv tables
+
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analyzer.ingest import get_compiled_path, read_compiled, write_compiled
+
+
+def test_concurrent_writers(tmp_path):
+    # every writer renames a temporary file of its own, the last rename wins and no temporary file is left
+    compiled_path = get_compiled_path("table", tmp_path)
+    frames = [pd.DataFrame({"GeoName": ["Alabama", "Alaska"], "2020": [float(i), float(i + 1)]}) for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda frame: write_compiled(frame, compiled_path), frames))
+
+    assert any(read_compiled(compiled_path).equals(frame) for frame in frames)
+    assert [path.name for path in tmp_path.iterdir()] == [compiled_path.name]
@@ -0,0 +1,136 @@
+# Background refresh of the BEA data, against the local stub of the BEA API (conftest.py)
+
+
+import pandas as pd
+import pytest
+
+from conftest import get_data_response
+from analyzer import refresh_worker
+from analyzer.screening import LIST_OF_STATES
+
+
+def get_income_rows(quarters):
+    # per capita personal income of every state, growing at a different rate in every state
+    rows = []
+    for i, state in enumerate(LIST_OF_STATES):
+        for j, quarter in enumerate(quarters):
+            value = 40000 * (1 + i / 100) * (1 + (i % 7) / 200) ** j
+            rows.append({"GeoFips": f"{i + 1:02d}000", "GeoName": state, "TimePeriod": quarter,
+                         "DataValue": f"{value:,.0f}"})
+    return rows
+
+
+def get_quarters(first_year, last_quarter):
+    return [str(quarter) for quarter in pd.period_range(f"{first_year}Q1", last_quarter, freq="Q")]
+
+
+@pytest.fixture
+def bea(bea_stub, monkeypatch):
+    # five years of data up to the last quarter of 2021, and no release or worker left from another test
+    monkeypatch.setenv("DASHBOARD_REFRESH_INTERVAL", "0")
+    monkeypatch.setattr(refresh_worker, "_release", None)
+    monkeypatch.setattr(refresh_worker, "_worker", None)
+    bea_stub.responses["getdatasetlist"] = {"BEAAPI": {"Results": {"Dataset": [{"DatasetName": "Regional"}]}}}
+    bea_stub.responses["sqinc1"] = get_data_response(get_income_rows(get_quarters(2017, "2021Q4")))
+    return bea_stub
+
+
+def publish_new_quarter(bea):
+    bea.responses["sqinc1"] = get_data_response(get_income_rows(get_quarters(2017, "2022Q1")))
+
+
+def test_first_release(bea):
+    release = refresh_worker.get_release("key")
+    assert release["latest_quarter"] == "2021Q4"
+    assert release["income_dataset"]["first_quarter"] == "2017Q1"
+    assert refresh_worker.get_release("key") is release
+    assert not refresh_worker.poll("key")
+
+
+def test_new_quarter_in_new_year(bea):
+    refresh_worker.get_release("key")
+    publish_new_quarter(bea)
+    assert refresh_worker.poll("key")
+
+    release = refresh_worker.get_release("key")
+    assert release["latest_quarter"] == "2022Q1"
+    assert release["changed_periods"] == ("2022Q1",)
+    # the five year window rolls to the new year
+    assert release["income_dataset"]["first_quarter"] == "2018Q1"
+    assert release["income_dataset"]["latest_quarter"] == "2022Q1"
+    assert release["aggregates"]["latest"]["TimePeriod"].eq("2022Q1").all()
+    assert 2022 in set(release["aggregates"]["annual"]["Year"])
+    assert len(release["income_dataset"]["emerging_markets"]["targets"]) == 8
+
+
+@pytest.mark.parametrize("failing", ["update_income_aggregates", "get_income_dataset", "warm_figures"])
+def test_failed_build_is_retried(bea, monkeypatch, failing):
+    first = refresh_worker.get_release("key")
+    publish_new_quarter(bea)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("build failed")
+
+    # the history with the new quarter is saved before the build fails
+    original = getattr(refresh_worker, failing)
+    monkeypatch.setattr(refresh_worker, failing, fail)
+    with pytest.raises(RuntimeError):
+        refresh_worker.poll("key")
+    assert refresh_worker.get_release("key") is first
+
+    # the next poll gets no new rows from BEA, but still publishes the saved history
+    monkeypatch.setattr(refresh_worker, failing, original)
+    assert refresh_worker.poll("key")
+    release = refresh_worker.get_release("key")
+    assert release["latest_quarter"] == "2022Q1"
+    assert release["changed_periods"] == ("2022Q1",)
+    assert release["aggregates"]["latest"]["TimePeriod"].eq("2022Q1").all()
+    assert release["income_dataset"]["latest_quarter"] == "2022Q1"
+    assert not refresh_worker.poll("key")
+
+
+def test_release_is_swapped_atomically(bea, monkeypatch):
+    first = refresh_worker.get_release("key")
+    first_targets = first["income_dataset"]["emerging_markets"]["targets"].copy()
+    publish_new_quarter(bea)
+
+    # sessions asking during the build still get the complete previous release
+    seen_during_build = []
+    warm_figures = refresh_worker.warm_figures
+
+    def record_release(income_dataset):
+        seen_during_build.append(refresh_worker.get_release("key"))
+        warm_figures(income_dataset)
+
+    monkeypatch.setattr(refresh_worker, "warm_figures", record_release)
+    assert refresh_worker.poll("key")
+    assert seen_during_build == [first]
+
+    # the previous release is left as it was for the sessions still using it
+    assert refresh_worker.get_release("key") is not first
+    assert first["latest_quarter"] == "2021Q4"
+    assert first["income_dataset"]["latest_quarter"] == "2021Q4"
+    pd.testing.assert_series_equal(first["income_dataset"]["emerging_markets"]["targets"], first_targets)
+    with pytest.raises(TypeError):
+        first["latest_quarter"] = "2022Q1"
+
+
+def test_restart_after_failed_build(bea, monkeypatch):
+    refresh_worker.get_release("key")
+    publish_new_quarter(bea)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("build failed")
+
+    update_income_aggregates = refresh_worker.update_income_aggregates
+    monkeypatch.setattr(refresh_worker, "update_income_aggregates", fail)
+    with pytest.raises(RuntimeError):
+        refresh_worker.poll("key")
+
+    # a new process has no release to compare with, the aggregates older than the saved history are computed again
+    monkeypatch.setattr(refresh_worker, "update_income_aggregates", update_income_aggregates)
+    monkeypatch.setattr(refresh_worker, "_release", None)
+    release = refresh_worker.get_release("key")
+    assert release["latest_quarter"] == "2022Q1"
+    assert release["aggregates"]["latest"]["TimePeriod"].eq("2022Q1").all()
+    assert "2021Q4" in release["aggregates"]["growth"].columns
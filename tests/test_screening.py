@@ -0,0 +1,40 @@
+# Emerging markets screen and its scenario sweep
+
+
+import numpy as np
+import pandas as pd
+
+from analyzer.screening import LIST_OF_STATES, check_scenario, get_income_by_quarter, get_scenarios, run_scenarios
+
+
+def get_personal_income(first_quarter="2018Q1", last_quarter="2022Q4"):
+    quarters = pd.period_range(first_quarter, last_quarter, freq="Q").astype(str)
+    return pd.DataFrame([{"GeoName": state, "TimePeriod": quarter,
+                          "DataValue": 40000 * (1 + i / 100) * (1 + (i % 7) / 200) ** j}
+                         for i, state in enumerate(LIST_OF_STATES) for j, quarter in enumerate(quarters)])
+
+
+def test_default_quarters_follow_the_data():
+    income_by_quarter = get_income_by_quarter(get_personal_income())
+    [scenario] = get_scenarios([20], [8], [None], [None], [None])
+    assert check_scenario(income_by_quarter, scenario) == (dict(scenario, start="2018Q1", end="2022Q4"), None)
+
+
+def test_bad_quarters_are_reported():
+    income_by_quarter = get_income_by_quarter(get_personal_income())
+    for start, end in [("2017Q1", "2022Q4"), ("2018Q1", "2023Q1"), ("2020Q1", "2019Q1"), ("first", "2022Q4")]:
+        [scenario] = get_scenarios([20], [8], [start], [end], [None])
+        assert check_scenario(income_by_quarter, scenario)[1] is not None
+
+
+def test_bad_scenario_does_not_stop_the_sweep():
+    scenarios = get_scenarios([20], [8], ["2017Q1", "2019Q1", None], [None], [None])
+    results = run_scenarios(get_personal_income(), scenarios, max_workers=1)
+
+    errors = results.dropna(subset=["error"])
+    assert list(errors["scenario_id"]) == [0]
+    ranked = results[results["error"].isna()]
+    assert sorted(ranked["scenario_id"].unique()) == [1, 2]
+    assert (ranked.groupby("scenario_id")["rank"].max() == 8).all()
+    assert set(ranked.loc[ranked["scenario_id"] == 2, "start"]) == {"2018Q1"}
+    assert np.isfinite(ranked["income_growth"]).all()
@@ -0,0 +1,47 @@
+# Process wide datasets shared by every session
+
+
+import numpy as np
+import pytest
+
+from analyzer.shared_data import clear_shared, get_shared
+
+
+@pytest.fixture
+def builds():
+    clear_shared("test dataset")
+    yield []
+    clear_shared("test dataset")
+
+
+def build(builds, version):
+    builds.append(version)
+    return {"values": np.arange(3), "version": version}
+
+
+def test_new_version_replaces_old(builds):
+    first = get_shared("test dataset", 1, build, builds, 1)
+    assert get_shared("test dataset", 1, build, builds, 1) is first
+    get_shared("test dataset", 2, build, builds, 2)
+    assert get_shared("test dataset", 1, build, builds, 1) is not first
+    assert builds == [1, 2, 1]
+
+
+def test_versions_kept_least_recently_used(builds):
+    first = get_shared("test dataset", 1, build, builds, 1, max_versions=2)
+    get_shared("test dataset", 2, build, builds, 2, max_versions=2)
+    assert get_shared("test dataset", 1, build, builds, 1, max_versions=2) is first
+
+    # version 2 is the least recently used one, the third version evicts it
+    get_shared("test dataset", 3, build, builds, 3, max_versions=2)
+    assert get_shared("test dataset", 1, build, builds, 1, max_versions=2) is first
+    get_shared("test dataset", 2, build, builds, 2, max_versions=2)
+    assert builds == [1, 2, 3, 2]
+
+
+def test_shared_arrays_are_read_only(builds):
+    dataset = get_shared("test dataset", 1, build, builds, 1)
+    with pytest.raises(ValueError):
+        dataset["values"][0] = 1
+    with pytest.raises(TypeError):
+        dataset["version"] = 2